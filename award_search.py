@@ -1,8 +1,47 @@
+import argparse
+import asyncio
+import base64
+import io
 import requests
 import json
 import os
-from typing import List, Dict, Optional
-from twilio.rest import Client
+import queue
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
+from functools import lru_cache
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import urllib3
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Generator, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+# Only needed for the native asyncio search client, so imported on first use by load_aiohttp()
+aiohttp = None
+# Only needed for the columnar archive, so imported on first use by load_pyarrow()
+pyarrow = None
+# Only needed for vectorized filtering, so imported on first use by load_numpy()
+numpy = None
+
+try:
+    import ijson
+except ImportError:  # Without it responses are buffered and parsed whole
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # parse_json falls back to the stdlib decoder
+    orjson = None
 # from config import API_KEY, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, MY_PHONE_NUMBER
 
 API_KEY = os.environ.get("API_KEY")
@@ -11,53 +50,1220 @@ TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 MY_PHONE_NUMBER = os.environ.get("MY_PHONE_NUMBER")
 
-def fetch_flights(params: Dict[str, str]) -> Optional[str]:
+# Override to point the clients at a local mock server
+SEATS_AERO_BASE_URL = os.environ.get("SEATS_AERO_BASE_URL", "https://seats.aero/partnerapi")
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "30"))
+
+# "sequential", "threads" or "asyncio"
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "threads")
+SEARCH_CONCURRENCY = int(os.environ.get("SEARCH_CONCURRENCY", "8"))
+
+# Records requested per page, and a cap on pages fetched per search to protect quota
+SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", "500"))
+SEARCH_MAX_PAGES = int(os.environ.get("SEARCH_MAX_PAGES", "10"))
+
+# Parse data[] incrementally off the socket when ijson is installed
+STREAM_JSON = os.environ.get("STREAM_JSON", "1") == "1"
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "50"))
+
+# Merge parameter sets that share origins or destinations into one API query,
+# as long as the merged query stays within these bounds
+QUERY_PLANNER = os.environ.get("QUERY_PLANNER", "1") == "1"
+PLAN_MAX_DATE_SPAN_DAYS = int(os.environ.get("PLAN_MAX_DATE_SPAN_DAYS", "14"))
+PLAN_MAX_AIRPORTS = int(os.environ.get("PLAN_MAX_AIRPORTS", "20"))
+
+# "auto" uses orjson when installed, "json" forces the stdlib decoder
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto")
+
+# Filter batches record by record ("scalar") or with NumPy masks ("numpy"); "auto"
+# uses NumPy, when installed, for batches of at least VECTOR_FILTER_MIN_RECORDS
+# records shared by at least VECTOR_FILTER_MIN_SETS merged parameter sets.
+# bench/filter_bench.py compares the engines on synthetic records
+FILTER_ENGINE = os.environ.get("FILTER_ENGINE", "scalar")
+VECTOR_FILTER_MIN_RECORDS = int(os.environ.get("VECTOR_FILTER_MIN_RECORDS", "200"))
+VECTOR_FILTER_MIN_SETS = int(os.environ.get("VECTOR_FILTER_MIN_SETS", "3"))
+
+# Raw responses are reused for RESPONSE_CACHE_TTL seconds (0 disables caching);
+# set RESPONSE_CACHE_PATH to keep the cache across runs. The daemon never uses
+# it: its polls are an interval apart, so a hit would only ever be stale
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")
+# Most searches whose ETag/Last-Modified validators and last body are kept for conditional requests
+VALIDATOR_STORE_SIZE = int(os.environ.get("VALIDATOR_STORE_SIZE", "256"))
+
+# Token bucket shared by every API call, plus a daily call quota persisted in
+# API_QUOTA_PATH (set it to an empty string to keep usage in memory only).
+# Rate-limit headers returned by the API override the configured quota.
+API_RATE_PER_SECOND = float(os.environ.get("API_RATE_PER_SECOND", "5"))
+API_RATE_BURST = int(os.environ.get("API_RATE_BURST", "10"))
+API_DAILY_QUOTA = int(os.environ.get("API_DAILY_QUOTA", "1000"))
+API_QUOTA_PATH = os.environ.get("API_QUOTA_PATH", "seats_aero_quota.json")
+# Seconds to pause every caller after a 429 without a Retry-After header
+API_RATE_LIMIT_PAUSE = float(os.environ.get("API_RATE_LIMIT_PAUSE", "60"))
+
+# Total seconds a parameter set's search may spend, including retries
+SEARCH_DEADLINE = float(os.environ.get("SEARCH_DEADLINE", "120"))
+
+# Send one ranked, deduplicated SMS per cycle instead of one per parameter set,
+# trimmed to fit within SMS_SEGMENT_BUDGET billed segments
+SMS_DIGEST = os.environ.get("SMS_DIGEST", "0") == "1"
+SMS_SEGMENT_BUDGET = int(os.environ.get("SMS_SEGMENT_BUDGET", "4"))
+
+# Only alert on flights that are new, or cheaper than when last alerted, within
+# ALERT_EXPIRY_HOURS; alerted flights are remembered in a SQLite database
+ALERT_DEDUP = os.environ.get("ALERT_DEDUP", "1") == "1"
+ALERT_STORE_PATH = os.environ.get("ALERT_STORE_PATH", "alert_history.db")
+ALERT_EXPIRY_HOURS = float(os.environ.get("ALERT_EXPIRY_HOURS", "24"))
+
+# Compare each parameter set's results with its previous search, displaying and
+# alerting on what changed rather than on every flight found
+SNAPSHOT_DIFF = os.environ.get("SNAPSHOT_DIFF", "1") == "1"
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "result_snapshots.json")
+
+# Keep every availability record fetched in a SQLite database, for price history
+AVAILABILITY_HISTORY = os.environ.get("AVAILABILITY_HISTORY", "1") == "1"
+AVAILABILITY_HISTORY_PATH = os.environ.get("AVAILABILITY_HISTORY_PATH", "availability_history.db")
+# Most records written per transaction by the background writer
+AVAILABILITY_HISTORY_BATCH_SIZE = int(os.environ.get("AVAILABILITY_HISTORY_BATCH_SIZE", "5000"))
+
+# Also append every availability record fetched to a Parquet archive under this
+# directory, partitioned by observation date and source (requires pyarrow)
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH")
+# Records buffered before the archive writes them out early, mid-cycle
+ARCHIVE_FLUSH_RECORDS = int(os.environ.get("ARCHIVE_FLUSH_RECORDS", "100000"))
+
+# Seconds to wait at shutdown for queued SMS alerts to be sent
+SMS_DRAIN_TIMEOUT = float(os.environ.get("SMS_DRAIN_TIMEOUT", "10"))
+# Seconds the platform allows between SIGTERM and SIGKILL (30 on Heroku); the
+# daemon abandons in-flight searches and shortens the SMS drain to fit in it
+SHUTDOWN_GRACE_PERIOD = float(os.environ.get("SHUTDOWN_GRACE_PERIOD", "30"))
+
+# Parameter set keys that configure this script rather than the API query
+LOCAL_PARAMETER_KEYS = ("interval_minutes", "filter")
+# Polling interval for --daemon when a parameter set does not give one
+DEFAULT_INTERVAL_MINUTES = float(os.environ.get("DEFAULT_INTERVAL_MINUTES", "15"))
+
+# Let --daemon poll sets with near departures and a history of hits more often,
+# within these bounds, and slow down everything when the daily quota runs low
+PRIORITY_SCHEDULING = os.environ.get("PRIORITY_SCHEDULING", "1") == "1"
+MIN_INTERVAL_MINUTES = float(os.environ.get("MIN_INTERVAL_MINUTES", "5"))
+MAX_INTERVAL_MINUTES = float(os.environ.get("MAX_INTERVAL_MINUTES", "360"))
+POLL_HISTORY_PATH = os.environ.get("POLL_HISTORY_PATH", "poll_history.json")
+# Weight of the latest poll in each set's moving hit rate
+POLL_HISTORY_WEIGHT = float(os.environ.get("POLL_HISTORY_WEIGHT", "0.2"))
+
+# Fail fast after this many consecutive failed API calls, probing again after the timeout
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "60"))
+
+class SearchError(Exception):
+    """Raised when a search cannot be completed."""
+
+class QuotaExceededError(SearchError):
+    """Raised instead of making an API call that would exceed the daily quota."""
+
+# Set by the daemon's SIGTERM/SIGINT handler; retry and throttling waits end early once it is set
+_shutdown_requested = threading.Event()
+
+def wait_unless_shutdown(seconds: float) -> bool:
+    """Sleep for seconds, returning False early if shutdown has been requested."""
+    return not _shutdown_requested.wait(seconds)
+
+async def async_wait_unless_shutdown(seconds: float) -> bool:
+    """asyncio counterpart to wait_unless_shutdown, checking for shutdown twice a second."""
+    deadline = time.monotonic() + seconds
+    while not _shutdown_requested.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        await asyncio.sleep(min(remaining, 0.5))
+    return False
+
+def check_shutdown() -> None:
+    """Raise SearchError if shutdown has been requested, so in-flight searches stop early."""
+    if _shutdown_requested.is_set():
+        raise SearchError("Shutting down; search abandoned.")
+
+T = TypeVar("T")
+
+class LazySingleton(Generic[T]):
+    """Process-wide instance of a shared object, created on first use from any thread."""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Return the instance, creating it if this is the first call."""
+        with self._lock:
+            if self._instance is None:
+                self._instance = self._factory()
+            return self._instance
+
+    def peek(self) -> Optional[T]:
+        """Return the instance if it has been created, without creating it."""
+        return self._instance
+
+    def reset(self) -> Optional[T]:
+        """Forget the instance and return it, so it can be closed; the next get() creates a new one."""
+        with self._lock:
+            instance, self._instance = self._instance, None
+            return instance
+
+def atomic_write(path: str, text: str, description: str) -> None:
+    """Replace the file at path with text, writing a temporary file first so a crash never truncates it.
+
+    Errors are printed, naming the file by description, rather than raised.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving {description}: {e}")
+
+def canonical_params_key(params: Dict) -> str:
+    """Normalise params so equivalent searches share a key."""
+    normalised = {}
+    for key, value in params.items():
+        if isinstance(value, str) and "," in value:
+            value = ",".join(sorted({item.strip().upper() for item in value.split(",") if item.strip()}))
+        normalised[key] = str(value).strip()
+    return json.dumps(normalised, sort_keys=True)
+
+class ResponseCache:
+    """Size-bounded LRU cache of raw search responses with a per-entry TTL.
+
+    Entries are keyed on a canonical form of the query parameters, so the same
+    search written with airports in a different order or spacing is a hit.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_SIZE,
+                 path: Optional[str] = RESPONSE_CACHE_PATH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def get(self, params: Dict) -> Optional[bytes]:
+        """Return the cached body for params, or None if missing, expired or the cache is disabled."""
+        if not self.enabled:
+            return None
+        key = canonical_params_key(params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    @property
+    def enabled(self) -> bool:
+        """Whether put() stores anything; a TTL or size of 0 disables the cache."""
+        return self.ttl > 0 and self.max_entries > 0
+
+    def put(self, params: Dict, body: bytes) -> None:
+        """Store body for params, evicting the least recently used entries."""
+        if not self.enabled:
+            return
+        key = canonical_params_key(params)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and entry counts."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def load(self) -> None:
+        """Load unexpired entries persisted by a previous run."""
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            now = time.time()
+            # Bodies are stored base64-encoded; decode everything before touching the cache
+            loaded = [(key, float(expires_at), base64.b64decode(body))
+                      for key, (expires_at, body) in entries.items() if float(expires_at) > now]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Error loading response cache: {e}")
+            return
+
+        with self._lock:
+            for key, expires_at, body in loaded:
+                self._entries[key] = (expires_at, body)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """Persist the cache to disk, if a path is configured."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = {key: [expires_at, base64.b64encode(body).decode("ascii")]
+                       for key, (expires_at, body) in self._entries.items()}
+        atomic_write(self.path, json.dumps(entries), "response cache")
+
+class ValidatorStore:
+    """Remembers ETag/Last-Modified validators and the last body seen per search, least recently used first out.
+
+    Lets a client send conditional requests and, on 304 Not Modified, reuse
+    the previous body instead of downloading it again. The cursor is left
+    out of the key: the API hands out a new one with every search, so
+    keying on it would keep a never-matching entry per page per poll.
+    """
+
+    def __init__(self, max_entries: int = VALIDATOR_STORE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(params: Dict) -> str:
+        """Return the key params' validators are stored under."""
+        return canonical_params_key({name: value for name, value in params.items() if name != "cursor"})
+
+    def _get(self, params: Dict) -> Optional[Dict[str, Any]]:
+        key = self.key(params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def request_headers(self, params: Dict) -> Dict[str, str]:
+        """Return the conditional headers to send for params."""
+        entry = self._get(params)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, params: Dict, headers, body: bytes) -> None:
+        """Remember the validators and body of a 200 response, if it had any."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if (not etag and not last_modified) or self.max_entries <= 0:
+            return
+        key = self.key(params)
+        with self._lock:
+            self._entries[key] = {"etag": etag, "last_modified": last_modified, "body": body}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def body(self, params: Dict) -> Optional[bytes]:
+        """Return the body previously stored for params."""
+        entry = self._get(params)
+        return entry["body"] if entry is not None else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+_response_cache = LazySingleton(ResponseCache)
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache shared by every client."""
+    return _response_cache.get()
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Return the delay requested by a Retry-After header, if any."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """Token bucket and daily quota tracker shared by every API caller.
+
+    Callers reserve a slot before each request and wait out the returned
+    delay, so threads and asyncio tasks share one schedule. Rate-limit
+    headers on responses keep the quota in sync with the API, and a 429 or
+    exhausted window pauses all callers until the API says to resume.
+    """
+
+    def __init__(self, rate: float = API_RATE_PER_SECOND, burst: int = API_RATE_BURST,
+                 daily_quota: int = API_DAILY_QUOTA, path: Optional[str] = API_QUOTA_PATH):
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.path = path
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.day = datetime.now(timezone.utc).date().isoformat()
+        self.used_today = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def _roll_day(self) -> None:
+        today = datetime.now(timezone.utc).date().isoformat()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    def reserve(self) -> float:
+        """Reserve one API call and return how many seconds to wait before making it."""
+        with self._lock:
+            self._roll_day()
+            if self.daily_quota and self.used_today >= self.daily_quota:
+                raise QuotaExceededError(f"Daily API quota of {self.daily_quota} calls used up.")
+            self.used_today += 1
+
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # Tokens go negative while callers queue; each waits for its own slot
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self) -> None:
+        """Block until an API call may be made."""
+        wait = self.reserve()
+        if wait > 0 and not wait_unless_shutdown(wait):
+            check_shutdown()
+
+    async def acquire_async(self) -> None:
+        """Wait, without blocking the event loop, until an API call may be made."""
+        wait = self.reserve()
+        if wait > 0 and not await async_wait_unless_shutdown(wait):
+            check_shutdown()
+
+    def update(self, status_code: int, headers) -> None:
+        """Adjust to a response's status code and rate-limit headers."""
+        limit = headers.get("X-RateLimit-Limit") or headers.get("RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining") or headers.get("RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+        pause = retry_after_seconds(headers) if status_code == 429 else None
+
+        with self._lock:
+            self._roll_day()
+            try:
+                if limit is not None and remaining is not None:
+                    self.daily_quota = int(limit)
+                    self.used_today = max(self.used_today, int(limit) - int(remaining))
+                if remaining is not None and int(remaining) <= 0 and reset is not None:
+                    reset_seconds = float(reset)
+                    # Reset may be an epoch timestamp or a delay in seconds
+                    if reset_seconds > time.time():
+                        reset_seconds -= time.time()
+                    pause = max(pause or 0.0, reset_seconds)
+            except ValueError:
+                pass
+
+            if status_code == 429 and pause is None:
+                pause = API_RATE_LIMIT_PAUSE
+            if pause:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the calls made and quota remaining today."""
+        with self._lock:
+            self._roll_day()
+            return {"used": self.used_today, "quota": self.daily_quota,
+                    "remaining": max(self.daily_quota - self.used_today, 0)}
+
+    def load(self) -> None:
+        """Load today's usage persisted by a previous run."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading API quota state: {e}")
+            return
+        if state.get("day") == self.day:
+            self.used_today = int(state.get("used", 0))
+
+    def save(self) -> None:
+        """Persist today's usage, if a path is configured."""
+        if not self.path:
+            return
+        with self._lock:
+            state = {"day": self.day, "used": self.used_today}
+        atomic_write(self.path, json.dumps(state), "API quota state")
+
+_rate_limiter = LazySingleton(RateLimiter)
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter shared by every client."""
+    return _rate_limiter.get()
+
+@dataclass
+class RetryPolicy:
+    """How often, and how patiently, to retry one class of error."""
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+# Error class -> retry policy. Delays grow exponentially from base_delay with
+# full jitter; rate_limited waits at least as long as Retry-After asks.
+RETRY_POLICIES = {
+    "timeout": RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0),
+    "connection": RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0),
+    "server_error": RetryPolicy(max_attempts=4, base_delay=2.0, max_delay=30.0),
+    "rate_limited": RetryPolicy(max_attempts=3, base_delay=5.0, max_delay=120.0),
+}
+
+# Monotonic deadline for the search running in the current thread or task
+_search_deadline: ContextVar[Optional[float]] = ContextVar("search_deadline", default=None)
+
+class SearchDeadlineError(SearchError):
+    """Raised instead of starting a request once the current search's deadline has passed."""
+
+def search_time_left() -> Optional[float]:
+    """Return the seconds left before the current search's deadline, or None if it has none.
+
+    Raises SearchDeadlineError once the deadline has passed, and SearchError
+    once shutdown has been requested.
+    """
+    check_shutdown()
+    deadline = _search_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise SearchDeadlineError(f"Search deadline of {SEARCH_DEADLINE:g}s reached; returning partial results.")
+    return remaining
+
+class RetryEngine:
+    """Decides whether and when to retry a failed API call, and keeps attempt statistics."""
+
+    def __init__(self, policies: Dict[str, RetryPolicy] = RETRY_POLICIES):
+        self.policies = policies
+        self.attempts_per_call: Dict[int, int] = {}
+        self.retries_by_class: Dict[str, int] = {}
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify_status(status_code: int) -> Optional[str]:
+        """Return the error class of an HTTP status, or None if it should not be retried."""
+        if status_code == 429:
+            return "rate_limited"
+        if 500 <= status_code < 600:
+            return "server_error"
+        return None
+
+    @staticmethod
+    def classify_exception(error: BaseException) -> Optional[str]:
+        """Return the error class of a transport exception, or None if it should not be retried."""
+        if isinstance(error, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+            return "timeout"
+        if isinstance(error, urllib3.exceptions.ReadTimeoutError):
+            return "timeout"
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                              urllib3.exceptions.ProtocolError)):
+            return "connection"
+        if aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError):
+            return "connection"
+        return None
+
+    def next_delay(self, error_class: Optional[str], attempt: int,
+                   retry_after: Optional[float] = None) -> Optional[float]:
+        """Return the delay before retrying attempt, or None to give up.
+
+        Gives up when the error class is not retryable, its attempts are used
+        up, or the wait would overrun the current search's deadline.
+        """
+        policy = self.policies.get(error_class) if error_class else None
+        if policy is None or attempt >= policy.max_attempts:
+            return None
+
+        delay = random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        deadline = _search_deadline.get()
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+
+        with self._lock:
+            self.retries_by_class[error_class] = self.retries_by_class.get(error_class, 0) + 1
+        return delay
+
+    def record(self, attempts: int, succeeded: bool) -> None:
+        """Record how many attempts one call took."""
+        with self._lock:
+            self.attempts_per_call[attempts] = self.attempts_per_call.get(attempts, 0) + 1
+            if not succeeded:
+                self.gave_up += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return attempts-per-call counts, retries by error class and calls given up on."""
+        with self._lock:
+            return {
+                "attempts_per_call": dict(sorted(self.attempts_per_call.items())),
+                "retries_by_class": dict(self.retries_by_class),
+                "gave_up": self.gave_up
+            }
+
+# Retries for sending an SMS that failed with a network error, 429 or 5xx
+SMS_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=2.0, max_delay=30.0)
+
+_retry_engine = LazySingleton(RetryEngine)
+
+def get_retry_engine() -> RetryEngine:
+    """Return the process-wide retry engine shared by every client."""
+    return _retry_engine.get()
+
+class CircuitOpenError(SearchError):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Stops calling a degraded API until it has had time to recover.
+
+    Closed: calls go through. After failure_threshold consecutive failed
+    calls the breaker opens and every call fails fast. Once reset_timeout
+    seconds have passed it half-opens and lets a single probe call through;
+    the probe's outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.fast_failures = 0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return the current state, moving from open to half-open once the timeout has passed."""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may be made now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.fast_failures += 1
+        raise CircuitOpenError("Seats.aero API circuit breaker is open; skipping this search.")
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("Seats.aero API recovered; circuit breaker closed.")
+            self._state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker if the threshold is reached or a probe failed."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"Seats.aero API failing; circuit breaker open for {self.reset_timeout:.0f}s.")
+                self._state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a call that reached no verdict on the API's health, letting the next call probe instead."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the state, consecutive failure count and number of fast-failed calls."""
+        with self._lock:
+            return {"state": self._current_state(), "consecutive_failures": self.consecutive_failures,
+                    "fast_failures": self.fast_failures}
+
+_circuit_breaker = LazySingleton(CircuitBreaker)
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker shared by every client."""
+    return _circuit_breaker.get()
+
+class SeatsAeroClient:
+    """Long-lived, connection-pooled client for the Seats.aero partner API."""
+
+    base_url = SEATS_AERO_BASE_URL
+
+    def __init__(self, api_key: Optional[str] = API_KEY, pool_size: int = HTTP_POOL_SIZE,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 cache: Optional[ResponseCache] = None, limiter: Optional[RateLimiter] = None,
+                 retry: Optional[RetryEngine] = None, breaker: Optional[CircuitBreaker] = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.validators = ValidatorStore()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "accept": "application/json",
+            # Every compression scheme urllib3 can decode here (gzip and deflate, plus br/zstd when installed)
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Partner-Authorization": f"Bearer {api_key}"
+        })
+        # Keep-alive connections are returned to the pool and reused by later searches
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, path: str, params: Dict[str, str], stream: bool = False,
+            headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """Issue a GET request against the API using the pooled session.
+
+        Transient failures are retried according to the client's retry
+        engine. While the circuit breaker is open, raises CircuitOpenError
+        without calling the API.
+        """
+        if self.breaker is None:
+            return self._get_with_retries(path, params, stream, headers)
+
+        self.breaker.before_call()
+        try:
+            response = self._get_with_retries(path, params, stream, headers)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Quota, deadline and interrupt errors say nothing about the API; free a half-open probe
+            self.breaker.release_probe()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _get_with_retries(self, path: str, params: Dict[str, str], stream: bool,
+                          headers: Optional[Dict[str, str]]) -> requests.Response:
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = search_time_left()
+            # Neither the connect nor a read wait may outlast the search's deadline
+            timeout = self.timeout if remaining is None else tuple(min(t, remaining) for t in self.timeout)
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                response = self.session.get(f"{self.base_url}/{path}", params=params, headers=headers,
+                                            timeout=timeout, stream=stream)
+            except requests.exceptions.RequestException as e:
+                delay = self.retry.next_delay(self.retry.classify_exception(e), attempt) if self.retry else None
+                if delay is None:
+                    if self.retry is not None:
+                        self.retry.record(attempt, succeeded=False)
+                    raise
+                print(f"Retrying in {delay:.1f}s after error: {e}")
+                if not wait_unless_shutdown(delay):
+                    check_shutdown()
+                continue
+
+            if self.limiter is not None:
+                self.limiter.update(response.status_code, response.headers)
+            if self.retry is None:
+                return response
+
+            delay = self.retry.next_delay(self.retry.classify_status(response.status_code), attempt,
+                                          retry_after_seconds(response.headers))
+            if delay is None:
+                self.retry.record(attempt, succeeded=response.ok or response.status_code == 304)
+                return response
+            print(f"Retrying in {delay:.1f}s after HTTP {response.status_code}")
+            response.close()
+            if not wait_unless_shutdown(delay):
+                check_shutdown()
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Count requests served over new versus reused (keep-alive) connections."""
+        new_connections = 0
+        total_requests = 0
+        # The same adapter is mounted for both schemes, so only count it once
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                new_connections += pool.num_connections
+                total_requests += pool.num_requests
+        return {
+            "requests": total_requests,
+            "new_connections": new_connections,
+            "reused_connections": max(total_requests - new_connections, 0)
+        }
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+_default_client = LazySingleton(lambda: SeatsAeroClient(cache=get_response_cache(), limiter=get_rate_limiter(),
+                                                        retry=get_retry_engine(), breaker=get_circuit_breaker()))
+
+def get_client() -> SeatsAeroClient:
+    """Return the process-wide client shared by every caller."""
+    return _default_client.get()
+
+def fetch_flights(params: Dict[str, str], client: Optional[SeatsAeroClient] = None) -> Optional[bytes]:
     """Fetch flights from the Seats.aero API."""
-    url = "https://seats.aero/partnerapi/search"
-    headers = {
-        "accept": "application/json",
-        "Partner-Authorization": f"Bearer {API_KEY}"
-    }
-    
+    client = client or get_client()
+
+    if client.cache is not None:
+        cached_body = client.cache.get(params)
+        if cached_body is not None:
+            return cached_body
+
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = client.get("search", params, headers=client.validators.request_headers(params))
         response.raise_for_status()
-        return response.text
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
         return None
 
-def parse_json(response_text: str) -> Dict:
-    """Parse the JSON response text into a dictionary."""
+    if response.status_code == 304:
+        response_body = client.validators.body(params)
+    else:
+        # Raw bytes go straight to the JSON decoder without a unicode decode step
+        response_body = response.content
+        client.validators.update(params, response.headers, response_body)
+
+    if client.cache is not None and response_body:
+        client.cache.put(params, response_body)
+    return response_body
+
+def get_json_loads(backend: str = JSON_BACKEND) -> Callable[[Union[str, bytes]], Any]:
+    """Return the JSON decoder for backend ("auto", "orjson" or "json").
+
+    "auto" prefers orjson when it is installed and falls back to the stdlib.
+    Both raise json.JSONDecodeError (orjson's error subclasses it) on bad input.
+    """
+    if backend == "json" or (backend == "auto" and orjson is None):
+        return json.loads
+    if backend in ("auto", "orjson"):
+        if orjson is None:
+            raise RuntimeError("orjson is not installed")
+        return orjson.loads
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+json_loads = get_json_loads()
+
+def parse_json(response_body: Union[str, bytes]) -> Dict:
+    """Parse the JSON response body into a dictionary."""
     try:
-        return json.loads(response_text)
+        return json_loads(response_body)
     except json.JSONDecodeError:
         print("Error decoding JSON response.")
         return {}
 
-def filter_flights(flights: List[Dict], threshold: int) -> List[Dict]:
-    """Filter flights based on business class availability and mileage cost."""
-    filtered_flights = []
-    for flight in flights:
-        if flight.get("JAvailable") and flight.get("JMileageCost") and flight.get("Source") == "aeroplan":
-            try:
-                mileage_cost = int(flight["JMileageCost"])
-                airlines = flight.get("JAirlines", [])
-
-                if "AI" not in airlines and mileage_cost <= threshold:
-                    filtered_flights.append({
-                        "RouteID": flight.get("RouteID"),
-                        "Origin": flight["Route"].get("OriginAirport"),
-                        "Destination": flight["Route"].get("DestinationAirport"),
-                        "Date": flight.get("Date"),
-                        "MileageCost": mileage_cost,
-                        "Airlines": airlines,
-                        "DirectFlight": flight.get("JDirect"),
-                        "RemainingSeats": flight.get("JRemainingSeats")
-                    })
-            except ValueError:
-                print(f"Error converting mileage cost to integer for flight ID: {flight.get('ID')}")
-    return filtered_flights
+# Cabin codes used as field prefixes in availability records
+CABINS = ("Y", "W", "J", "F")
+# Settings each rule in a parameter set's "filter" entry may give
+FILTER_RULE_KEYS = ("name", "cabins", "sources", "exclude_airlines", "require_airlines", "direct_only", "min_seats",
+                    "mileage_threshold", "max_cost")
+# Values of the API's cabin query parameter, by cabin code
+QUERY_CABINS = {"economy": "Y", "premium": "W", "business": "J", "first": "F"}
+
+def airline_codes(airlines) -> FrozenSet[str]:
+    """Parse a record's airlines, given either as a comma-separated string or a list."""
+    if isinstance(airlines, str):
+        return frozenset(code.strip().upper() for code in airlines.split(",") if code.strip())
+    return frozenset(code.upper() for code in airlines or ())
+
+def airlines_match(airlines, codes: FrozenSet[str]) -> bool:
+    """Return whether any of codes operates a flight with these airlines."""
+    # A substring test is cheap and rules out most flights before the airlines are parsed
+    for code in codes:
+        if code in airlines:
+            # A list holds whole codes; a string is split into them, which airline_codes() would do more slowly
+            return isinstance(airlines, list) or not codes.isdisjoint(map(str.strip, airlines.upper().split(",")))
+    return False
+
+@dataclass(frozen=True)
+class FilterRule:
+    """Which availability a parameter set alerts on.
+
+    The defaults are the original filter: aeroplan business class, not
+    operated by Air India.
+    """
+    # (cabin, mileage cost ceiling) for each cabin to match, in CABINS order
+    max_costs: Tuple[Tuple[str, int], ...] = (("J", 120000),)
+    # Empty matches any source
+    sources: FrozenSet[str] = frozenset({"aeroplan"})
+    exclude_airlines: FrozenSet[str] = frozenset({"AI"})
+    # If given, at least one of these must operate the flight
+    require_airlines: FrozenSet[str] = frozenset()
+    direct_only: bool = False
+    min_seats: int = 0
+    # Tag given to the flights this rule matches
+    name: str = "J aeroplan"
+
+def _code_set(value, setting: str) -> FrozenSet[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple, set, frozenset)):
+        raise ValueError(f"filter setting {setting} must be a list or a comma-separated string")
+    return frozenset(str(code).strip() for code in value if str(code).strip())
+
+def parse_filter_rule(mileage_threshold: int = 120000, spec: Optional[Dict] = None) -> FilterRule:
+    """Build a FilterRule from a parameter set's mileage_threshold and one rule of its "filter" entry.
+
+    The rule may give a name to tag its matches with, cabins, sources,
+    exclude_airlines and require_airlines as lists or comma-separated
+    strings, direct_only, min_seats, its own mileage_threshold, and a
+    max_cost mapping of cabin to a ceiling that overrides the threshold for
+    that cabin. Raises ValueError for settings that are unknown or malformed.
+    """
+    spec = dict(spec or {})
+    unknown = set(spec) - set(FILTER_RULE_KEYS)
+    if unknown:
+        raise ValueError(f"unknown filter settings: {', '.join(sorted(unknown))}")
+
+    cabins = {cabin.upper() for cabin in _code_set(spec.get("cabins", ["J"]), "cabins")}
+    if not cabins or not cabins <= set(CABINS):
+        raise ValueError(f"filter cabins must be some of {', '.join(CABINS)}")
+    max_cost = spec.get("max_cost", {})
+    if not isinstance(max_cost, dict) or not set(max_cost) <= cabins:
+        raise ValueError("filter max_cost must map the rule's cabins to mileage ceilings")
+    mileage_threshold = spec.get("mileage_threshold", mileage_threshold)
+    sources = frozenset(source.lower() for source in _code_set(spec.get("sources", ["aeroplan"]), "sources"))
+    ordered_cabins = [cabin for cabin in CABINS if cabin in cabins]
+    name = spec.get("name") or f"{'/'.join(ordered_cabins)} {'/'.join(sorted(sources)) or 'any source'}"
+    return FilterRule(
+        max_costs=tuple((cabin, int(max_cost.get(cabin, mileage_threshold))) for cabin in ordered_cabins),
+        sources=sources,
+        exclude_airlines=frozenset(code.upper() for code in _code_set(spec.get("exclude_airlines", ["AI"]),
+                                                                      "exclude_airlines")),
+        require_airlines=frozenset(code.upper() for code in _code_set(spec.get("require_airlines", []),
+                                                                      "require_airlines")),
+        direct_only=bool(spec.get("direct_only", False)),
+        min_seats=int(spec.get("min_seats", 0)),
+        name=str(name),
+    )
+
+def parse_filter_rules(mileage_threshold: int = 120000, spec: Union[None, Dict, List[Dict]] = None) -> Tuple[FilterRule, ...]:
+    """Build the rules of a parameter set whose "filter" entry is one rule or a list of them."""
+    specs = spec if isinstance(spec, list) else [spec]
+    if not specs:
+        raise ValueError("filter must give at least one rule")
+    return tuple(parse_filter_rule(mileage_threshold, rule_spec) for rule_spec in specs)
+
+# A parameter set's rules, a single rule, or a bare mileage threshold for the original business class filter
+RuleSpec = Union[int, FilterRule, Tuple[FilterRule, ...]]
+
+def as_filter_rules(rules: RuleSpec) -> Tuple[FilterRule, ...]:
+    """Accept a single rule or a bare mileage threshold wherever a parameter set's rules are expected."""
+    if isinstance(rules, tuple):
+        return rules
+    return (rules if isinstance(rules, FilterRule) else FilterRule(max_costs=(("J", int(rules)),)),)
+
+# Per-cabin record fields copied into flight summaries
+CABIN_SUMMARY_KEYS = {cabin: (f"{cabin}Direct", f"{cabin}RemainingSeats") for cabin in CABINS}
+
+def filtered_flight(flight: Dict, cabin: str, mileage_cost: int, airlines, rules: Tuple[str, ...]) -> Dict:
+    """Return the summary of a record that matched in cabin, tagged with the names of the rules it matched."""
+    direct_key, seats_key = CABIN_SUMMARY_KEYS[cabin]
+    return {
+        "RouteID": flight.get("RouteID"),
+        "Origin": flight["Route"].get("OriginAirport"),
+        "Destination": flight["Route"].get("DestinationAirport"),
+        "Date": flight.get("Date"),
+        "Cabin": cabin,
+        "Source": flight.get("Source"),
+        "MileageCost": mileage_cost,
+        "Airlines": airlines,
+        "DirectFlight": flight.get(direct_key),
+        "RemainingSeats": flight.get(seats_key),
+        "Rules": rules
+    }
+
+def compile_cabin_match(rule: FilterRule, cabin: str, ceiling: int) -> Callable[[Dict, int], Optional[Dict]]:
+    """Compile the checks rule makes on a record from one of its sources with availability in cabin.
+
+    The closure takes the record and its mileage cost in cabin, and returns
+    the flight summary, or None if the record does not match.
+    """
+    airlines_key = f"{cabin}Airlines"
+    direct_key, seats_key = f"{cabin}Direct", f"{cabin}RemainingSeats"
+    exclude = rule.exclude_airlines or None
+    require = rule.require_airlines or None
+    direct_only = rule.direct_only
+    min_seats = rule.min_seats
+    # Shared by every summary this rule produces
+    rules = (rule.name,)
+
+    def match(flight: Dict, mileage_cost: int) -> Optional[Dict]:
+        if mileage_cost > ceiling:
+            return None
+        if direct_only and not flight.get(direct_key):
+            return None
+        if min_seats and (flight.get(seats_key) or 0) < min_seats:
+            return None
+        airlines = flight.get(airlines_key, [])
+        if exclude is not None and airlines_match(airlines, exclude):
+            return None
+        if require is not None and not airlines_match(airlines, require):
+            return None
+        return filtered_flight(flight, cabin, mileage_cost, airlines, rules)
+
+    return match
+
+def parse_mileage_cost(flight: Dict, cost_key: str) -> Optional[int]:
+    """Return a record's mileage cost as an integer, or None (after reporting it) if it is malformed."""
+    try:
+        return int(flight[cost_key])
+    except ValueError:
+        print(f"Error converting mileage cost to integer for flight ID: {flight.get('ID')}")
+        return None
+
+@lru_cache(maxsize=None)
+def compile_filter_rule(rule: FilterRule) -> Callable[[Iterable[Dict]], Iterator[Dict]]:
+    """Compile a rule into a function yielding the flights it matches from any iterable of records.
+
+    Field names, ceilings and which checks apply are settled here, once per
+    rule, so matching a record only makes the comparisons its rule needs.
+    """
+    matchers = [(f"{cabin}Available", f"{cabin}MileageCost", compile_cabin_match(rule, cabin, ceiling))
+                for cabin, ceiling in rule.max_costs]
+    sources = rule.sources or None
+
+    def select(flights: Iterable[Dict]) -> Iterator[Dict]:
+        for flight in flights:
+            if sources is not None and flight.get("Source") not in sources:
+                continue
+            for available_key, cost_key, match in matchers:
+                if flight.get(available_key) and flight.get(cost_key):
+                    cost = parse_mileage_cost(flight, cost_key)
+                    if cost is None:
+                        continue
+                    matched = match(flight, cost)
+                    if matched is not None:
+                        yield matched
+
+    return select
+
+@lru_cache(maxsize=None)
+def compile_filter_rules(rules: Tuple[FilterRule, ...]) -> Callable[[Iterable[Dict]], Iterator[Dict]]:
+    """Compile a parameter set's rules into a function that evaluates them all in one pass over the records.
+
+    Each record's availability and mileage cost in a cabin are read once
+    however many rules watch that cabin. A flight matching several rules is yielded once,
+    tagged with every rule it matched, in rule order.
+    """
+    if len(rules) == 1:
+        return compile_filter_rule(rules[0])
+
+    by_cabin: Dict[str, List[Tuple[Optional[FrozenSet[str]], Callable[[Dict, int], Optional[Dict]]]]] = {}
+    for rule in rules:
+        for cabin, ceiling in rule.max_costs:
+            by_cabin.setdefault(cabin, []).append((rule.sources or None, compile_cabin_match(rule, cabin, ceiling)))
+    cabins = [(f"{cabin}Available", f"{cabin}MileageCost", by_cabin[cabin]) for cabin in CABINS if cabin in by_cabin]
+
+    def select(flights: Iterable[Dict]) -> Iterator[Dict]:
+        for flight in flights:
+            source = flight.get("Source")
+            for available_key, cost_key, checks in cabins:
+                if not (flight.get(available_key) and flight.get(cost_key)):
+                    continue
+                cost = parse_mileage_cost(flight, cost_key)
+                if cost is None:
+                    continue
+                matched = None
+                for sources, match in checks:
+                    if sources is not None and source not in sources:
+                        continue
+                    summary = match(flight, cost)
+                    if summary is None:
+                        continue
+                    if matched is None:
+                        matched = summary
+                    else:
+                        matched["Rules"] += summary["Rules"]
+                if matched is not None:
+                    yield matched
+
+    return select
+
+def iter_filtered_flights(flights: Iterable[Dict], rules: RuleSpec) -> Iterator[Dict]:
+    """Yield the flights matching a parameter set's rules, or the business class filter under a bare threshold.
+
+    Works on any iterable of records, so rejected records from a streamed
+    response are dropped as soon as they are parsed.
+    """
+    return compile_filter_rules(as_filter_rules(rules))(flights)
+
+def load_numpy():
+    """Import numpy on first use; returns None if it is not installed."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+    return numpy
+
+class FlightColumns:
+    """A batch of records' filter fields as NumPy arrays, built once and then filtered per parameter set.
+
+    Columns are built on first use for each cabin and set of sources, from
+    only the records with availability there, and each field only once a
+    rule or scope needs it. Pulling fields out of the records is the
+    expensive part, so this pays off when several parameter sets filter
+    the same batch. Raises ValueError on a malformed mileage cost, leaving
+    the scalar path to report the bad record.
+    """
+
+    def __init__(self, flights: List[Dict]):
+        self.flights = flights
+        self._groups: Dict[Tuple[str, FrozenSet[str]], Dict[str, Any]] = {}
+
+    def _group(self, cabin: str, sources: FrozenSet[str]) -> Dict[str, Any]:
+        group = self._groups.get((cabin, sources))
+        if group is None:
+            np = load_numpy()
+            available_key, cost_key = f"{cabin}Available", f"{cabin}MileageCost"
+            index = [i for i, flight in enumerate(self.flights)
+                     if flight.get(available_key) and flight.get(cost_key)
+                     and (not sources or flight.get("Source") in sources)]
+            records = [self.flights[i] for i in index]
+            group = {"cabin": cabin, "index": index, "records": records,
+                     "cost": np.array([flight[cost_key] for flight in records]).astype(np.int64)}
+            self._groups[(cabin, sources)] = group
+        return group
+
+    @staticmethod
+    def _field(group: Dict[str, Any], name: str):
+        if name in group:
+            return group[name]
+        np = load_numpy()
+        cabin, records = group["cabin"], group["records"]
+        if name == "airlines":
+            value = [flight.get(f"{cabin}Airlines", []) for flight in records]
+        elif name == "codes":
+            # Delimited on both sides so a substring search finds whole airline codes
+            value = np.array([f",{a.replace(' ', '') if isinstance(a, str) else ','.join(a)},"
+                              for a in FlightColumns._field(group, "airlines")], dtype=str)
+        elif name == "direct":
+            value = np.array([bool(flight.get(f"{cabin}Direct")) for flight in records], dtype=bool)
+        elif name == "seats":
+            value = np.array([_int_or_none(flight.get(f"{cabin}RemainingSeats")) or 0 for flight in records],
+                             dtype=np.int64)
+        elif name == "date":
+            value = np.array([(flight.get("Date") or "")[:10] for flight in records], dtype=str)
+        else:
+            key = "OriginAirport" if name == "origin" else "DestinationAirport"
+            value = np.array([flight["Route"].get(key) or "" for flight in records], dtype=str)
+        group[name] = value
+        return value
+
+    def select(self, rules: RuleSpec, params: Optional[Dict] = None) -> List[Dict]:
+        """Return the flights matching rules, limited to params' own query (as scope_filter does) if given.
+
+        Flights are tagged and ordered as compile_filter_rules does.
+        """
+        matches: Dict[Tuple[int, int], Dict] = {}
+        for rule in as_filter_rules(rules):
+            self._select_rule(rule, params, matches)
+        return [matches[key] for key in sorted(matches)]
+
+    def _select_rule(self, rule: FilterRule, params: Optional[Dict], matches: Dict[Tuple[int, int], Dict]) -> None:
+        np = load_numpy()
+        for cabin, ceiling in rule.max_costs:
+            group = self._group(cabin, rule.sources)
+            field = lambda name: self._field(group, name)
+            mask = group["cost"] <= ceiling
+            for code in rule.exclude_airlines:
+                mask &= np.char.find(field("codes"), f",{code},") < 0
+            if rule.require_airlines:
+                required = np.zeros(len(mask), dtype=bool)
+                for code in rule.require_airlines:
+                    required |= np.char.find(field("codes"), f",{code},") >= 0
+                mask &= required
+            if rule.direct_only:
+                mask &= field("direct")
+            if rule.min_seats:
+                mask &= field("seats") >= rule.min_seats
+            if params is not None:
+                mask &= np.isin(field("origin"), list(airport_set(params.get("origin_airport"))))
+                mask &= np.isin(field("destination"), list(airport_set(params.get("destination_airport"))))
+                mask &= ((field("date") >= (params.get("start_date") or ""))
+                         & (field("date") <= (params.get("end_date") or "9999-12-31")))
+            selected = np.flatnonzero(mask)
+            if not len(selected):
+                continue
+            airlines = field("airlines")
+            position = CABINS.index(cabin)
+            for i in selected:
+                # Keyed to give the scalar path's order: by record, then by cabin
+                key = (group["index"][i], position)
+                if key in matches:
+                    matches[key]["Rules"] += (rule.name,)
+                else:
+                    matches[key] = filtered_flight(self.flights[key[0]], cabin, int(group["cost"][i]), airlines[i],
+                                                   (rule.name,))
+
+def use_vector_filter(record_count: int, set_count: int, engine: str = FILTER_ENGINE) -> bool:
+    """Decide whether a batch shared by set_count parameter sets is filtered with NumPy."""
+    if engine == "numpy":
+        wanted = True
+    elif engine == "auto":
+        wanted = set_count >= VECTOR_FILTER_MIN_SETS and record_count >= VECTOR_FILTER_MIN_RECORDS
+    else:
+        wanted = False
+    return wanted and load_numpy() is not None
+
+def filter_flights(flights: List[Dict], rules: RuleSpec, engine: str = FILTER_ENGINE) -> List[Dict]:
+    """Filter flights with a parameter set's rules, or the business class filter under a bare mileage threshold."""
+    if use_vector_filter(len(flights), 1, engine):
+        try:
+            return FlightColumns(flights).select(rules)
+        except ValueError:
+            pass
+    return list(iter_filtered_flights(flights, rules))
 
 def display_flights(flights: List[Dict]) -> None:
     """Display filtered flight results."""
@@ -65,6 +1271,9 @@ def display_flights(flights: List[Dict]) -> None:
         print("Flights below the threshold:")
         for flight in flights:
             print(f"Route: {flight['Origin']} -> {flight['Destination']} on {flight['Date']}")
+            print(f"  Cabin: {flight.get('Cabin', 'J')} ({flight.get('Source', 'aeroplan')})")
+            if flight.get("Rules"):
+                print(f"  Matched Rules: {', '.join(flight['Rules'])}")
             print(f"  Mileage Cost: {flight['MileageCost']}")
             print(f"  Airlines: {flight['Airlines']}")
             print(f"  Direct Flight: {flight['DirectFlight']}")
@@ -72,12 +1281,11 @@ def display_flights(flights: List[Dict]) -> None:
     else:
         print("No flights found below the threshold.")
 
-def send_sms_notification(flights: List[Dict]) -> None:
-    """Send an SMS notification with the details of the five least expensive flights."""
-    if not flights:
-        print("No flights to send.")
-        return
-    
+def format_sms_message(flights: List[Dict]) -> Tuple[str, List[Dict]]:
+    """Format the ten least expensive flights as an SMS message.
+
+    Returns the message and the flights it lists.
+    """
     # Sort the flights by mileage cost in ascending order
     flights = sorted(flights, key=lambda x: x["MileageCost"])[:10]
     
@@ -86,118 +1294,1836 @@ def send_sms_notification(flights: List[Dict]) -> None:
     for flight in flights:
         message_body += (
             f"Route: {flight['Origin']} -> {flight['Destination']} on {flight['Date']}\n"
+            f"  Cabin: {flight.get('Cabin', 'J')} ({flight.get('Source', 'aeroplan')})\n"
             f"  Mileage Cost: {flight['MileageCost']}\n"
             f"  Airlines: {flight['Airlines']}\n"
             f"  Direct Flight: {flight['DirectFlight']}\n"
             f"  Remaining Seats: {flight['RemainingSeats']}\n\n"
         )
-    
-    # Initialize Twilio client
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    
+    return message_body, flights
+
+class AlertStore:
+    """Remembers which flights have been alerted, so unchanged availability is not re-sent.
+
+    Each flight is keyed by route, date, cabin, airlines and source program, and stored with
+    the mileage cost it was alerted at. A flight is alerted again once it
+    gets cheaper or its entry is older than the expiry.
+    """
+
+    def __init__(self, path: str = ALERT_STORE_PATH, expiry_hours: float = ALERT_EXPIRY_HOURS):
+        self.path = path
+        self.expiry = expiry_hours * 3600
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        # Shared with the SMS notifier thread, which records alerts once sent
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(alerts)")]
+            if columns and "source" not in columns:
+                # Older databases mixed programs' costs under one key; start their alert memory afresh
+                self._conn.execute("DROP TABLE alerts")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS alerts ("
+                "route TEXT NOT NULL, date TEXT NOT NULL, cabin TEXT NOT NULL, airlines TEXT NOT NULL, "
+                "source TEXT NOT NULL, cost INTEGER NOT NULL, alerted_at REAL NOT NULL, "
+                "PRIMARY KEY (route, date, cabin, airlines, source))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS alerts_alerted_at ON alerts (alerted_at)")
+
+    @staticmethod
+    def key(flight: Dict) -> Tuple[str, str, str, str, str]:
+        """Return the (route, date, cabin, airlines, source) key a flight is stored under.
+
+        Costs in different programs' miles are never compared, so the source is part of the key.
+        """
+        airlines = flight["Airlines"] if isinstance(flight["Airlines"], str) else ",".join(flight["Airlines"])
+        return (f"{flight['Origin']}-{flight['Destination']}", flight["Date"] or "",
+                flight.get("Cabin", "J"), airlines, flight.get("Source") or "")
+
+    def unalerted(self, flights: List[Dict]) -> List[Dict]:
+        """Return the flights that have not been alerted at their current cost or lower."""
+        cutoff = time.time() - self.expiry
+        fresh = []
+        with self._lock:
+            for flight in flights:
+                row = self._conn.execute(
+                    "SELECT cost FROM alerts WHERE route = ? AND date = ? AND cabin = ? AND airlines = ? "
+                    "AND source = ? AND alerted_at >= ?", (*self.key(flight), cutoff)
+                ).fetchone()
+                if row is None or flight["MileageCost"] < row[0]:
+                    fresh.append(flight)
+            self.suppressed += len(flights) - len(fresh)
+        return fresh
+
+    def record(self, flights: List[Dict]) -> None:
+        """Remember flights as alerted now, and forget expired entries."""
+        now = time.time()
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO alerts (route, date, cabin, airlines, source, cost, alerted_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(*self.key(flight), flight["MileageCost"], now) for flight in flights]
+                    )
+                    self._conn.execute("DELETE FROM alerts WHERE alerted_at < ?", (now - self.expiry,))
+            except sqlite3.Error as e:
+                print(f"Error recording sent alerts: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of remembered alerts and of flights suppressed as already alerted."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+            return {"entries": entries, "suppressed": self.suppressed}
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+_alert_store = LazySingleton(AlertStore)
+
+def get_alert_store() -> AlertStore:
+    """Return the process-wide alert store."""
+    return _alert_store.get()
+
+def unalerted_flights(flights: List[Dict]) -> List[Dict]:
+    """Drop flights already alerted at the same or a lower cost, if ALERT_DEDUP is on."""
+    if not ALERT_DEDUP or not flights:
+        return flights
     try:
-        # Send the SMS
-        message = client.messages.create(
-            body=message_body,
-            from_= TWILIO_PHONE_NUMBER,
-            to=MY_PHONE_NUMBER
+        return get_alert_store().unalerted(flights)
+    except sqlite3.Error as e:
+        print(f"Error checking alert history: {e}")
+        return flights
+
+# Formats flights into a message, returning it with the flights it actually lists
+MessageFormatter = Callable[[List[Dict]], Tuple[str, List[Dict]]]
+# An alert waiting to be sent: the flights and the function that formats them into a message
+AlertPayload = Tuple[List[Dict], MessageFormatter]
+
+class SmsNotifier:
+    """Sends SMS alerts through one long-lived, connection-pooled Twilio client.
+
+    Alert payloads passed to submit() are formatted and sent by a background
+    thread, with retries, so notification latency never holds up searching.
+    close() drains the queue before shutdown.
+    """
+
+    def __init__(self, account_sid: Optional[str] = TWILIO_ACCOUNT_SID, auth_token: Optional[str] = TWILIO_AUTH_TOKEN,
+                 from_number: Optional[str] = TWILIO_PHONE_NUMBER, to_number: Optional[str] = MY_PHONE_NUMBER,
+                 retry_policy: RetryPolicy = SMS_RETRY_POLICY):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.to_number = to_number
+        self.retry = RetryEngine({"sms": retry_policy})
+        self.sent = 0
+        self.failed = 0
+        self._client = None
+        self._queue: "queue.Queue[Optional[AlertPayload]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The shared Twilio client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                # Imported here so cycles that send nothing never load twilio
+                from twilio.rest import Client
+                self._client = Client(self.account_sid, self.auth_token)
+            return self._client
+
+    def send(self, message_body: str) -> bool:
+        """Send an SMS now, retrying transient failures. Returns whether it was sent."""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                message = self.client.messages.create(
+                    body=message_body,
+                    from_=self.from_number,
+                    to=self.to_number
+                )
+            except Exception as e:
+                # Twilio REST errors carry an HTTP status; client errors other than 429 won't succeed on retry
+                status = getattr(e, "status", None)
+                retryable = not isinstance(status, int) or status == 429 or status >= 500
+                delay = self.retry.next_delay("sms" if retryable else None, attempt)
+                if delay is None:
+                    print(f"Error sending SMS: {e}")
+                    self.retry.record(attempt, succeeded=False)
+                    with self._lock:
+                        self.failed += 1
+                    return False
+                print(f"Retrying SMS in {delay:.1f}s after error: {e}")
+                if not wait_unless_shutdown(delay):
+                    # Shutting down: leave the grace period to save state rather than keep retrying
+                    print("Shutting down; SMS not sent.")
+                    self.retry.record(attempt, succeeded=False)
+                    with self._lock:
+                        self.failed += 1
+                    return False
+                continue
+
+            print(f"SMS sent successfully! Message SID: {message.sid}")
+            self.retry.record(attempt, succeeded=True)
+            with self._lock:
+                self.sent += 1
+            return True
+
+    def submit(self, flights: List[Dict], format_message: MessageFormatter = format_sms_message) -> None:
+        """Queue an alert to be formatted and sent in the background.
+
+        After close(), alerts are sent immediately instead so none are lost.
+        """
+        with self._lock:
+            closed = self._closed
+            if not closed and (self._worker is None or not self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._run, name="sms-notifier", daemon=True)
+                self._worker.start()
+        if closed:
+            self.deliver(flights, format_message)
+        else:
+            self._queue.put((flights, format_message))
+
+    def deliver(self, flights: List[Dict], format_message: MessageFormatter) -> bool:
+        """Format and send an alert now, remembering the flights it listed once it is sent.
+
+        Flights left out of the message stay unalerted, so a later cycle can still send them.
+        """
+        message_body, listed = format_message(flights)
+        sent = self.send(message_body)
+        if sent and ALERT_DEDUP and listed:
+            get_alert_store().record(listed)
+        return sent
+
+    def _run(self) -> None:
+        while True:
+            payload = self._queue.get()
+            try:
+                if payload is None:
+                    return
+                flights, format_message = payload
+                self.deliver(flights, format_message)
+            except Exception as e:
+                print(f"Error sending SMS: {e}")
+            finally:
+                self._queue.task_done()
+
+    def pending(self) -> int:
+        """Return the number of alerts waiting to be sent."""
+        return self._queue.qsize()
+
+    def close(self, timeout: float = SMS_DRAIN_TIMEOUT) -> None:
+        """Stop accepting background work and wait up to timeout seconds for queued alerts to be sent."""
+        with self._lock:
+            self._closed = True
+            worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        # Queued alerts are sent before the worker reaches the stop marker
+        self._queue.put(None)
+        worker.join(timeout)
+        if worker.is_alive():
+            print(f"Gave up waiting for SMS delivery; {self.pending()} alerts were not sent.")
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of sent, failed and still-queued alerts."""
+        with self._lock:
+            return {"sent": self.sent, "failed": self.failed, "pending": self.pending()}
+
+_notifier = LazySingleton(SmsNotifier)
+
+def get_notifier() -> SmsNotifier:
+    """Return the process-wide SMS notifier."""
+    return _notifier.get()
+
+def send_sms_notification(flights: List[Dict]) -> None:
+    """Queue an SMS notification with the details of the ten least expensive flights."""
+    if not flights:
+        print("No flights to send.")
+        return
+
+    get_notifier().submit(flights)
+
+# Characters that take two GSM-7 code units (an escape plus the character)
+GSM_EXTENDED_CHARS = set("^{}\\[]~|€\f")
+GSM_BASIC_CHARS = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+def sms_segments(text: str) -> int:
+    """Return how many SMS segments text is billed as."""
+    if all(char in GSM_BASIC_CHARS or char in GSM_EXTENDED_CHARS for char in text):
+        length = sum(2 if char in GSM_EXTENDED_CHARS else 1 for char in text)
+        single, multipart = 160, 153
+    else:
+        # UCS-2; characters outside the BMP take two code units
+        length = sum(2 if ord(char) > 0xFFFF else 1 for char in text)
+        single, multipart = 70, 67
+    if length <= single:
+        return 1
+    return -(-length // multipart)
+
+def dedupe_flights(flights: List[Dict]) -> List[Dict]:
+    """Collapse the same flight reported by several parameter sets, keeping the cheapest.
+
+    The same flight in two programs is kept twice, since their mileage costs are not comparable.
+    """
+    cheapest: Dict[Tuple, Dict] = {}
+    for flight in flights:
+        airlines = flight["Airlines"] if isinstance(flight["Airlines"], str) else ",".join(flight["Airlines"])
+        key = (flight["Origin"], flight["Destination"], flight["Date"], flight.get("Cabin", "J"), airlines,
+               flight.get("Source"))
+        if key not in cheapest or flight["MileageCost"] < cheapest[key]["MileageCost"]:
+            cheapest[key] = flight
+    return list(cheapest.values())
+
+def format_digest_message(flights: List[Dict], segment_budget: int = SMS_SEGMENT_BUDGET) -> Tuple[str, List[Dict]]:
+    """Format flights from a whole cycle as one compact message within segment_budget segments.
+
+    Flights are deduplicated and ranked by mileage cost, then date; as many
+    as fit are listed, one per line, followed by a count of the rest.
+    Returns the message and the flights it lists.
+    """
+    flights = sorted(dedupe_flights(flights), key=lambda x: (x["MileageCost"], x["Date"] or ""))
+    message_body = f"{len(flights)} award flights found:"
+    for listed, flight in enumerate(flights):
+        airlines = flight["Airlines"] if isinstance(flight["Airlines"], str) else ",".join(flight["Airlines"])
+        line = (f"\n{flight['Origin']}-{flight['Destination']} {flight['Date']} {flight.get('Cabin', 'J')} "
+                f"{flight['MileageCost'] / 1000:g}k {airlines.replace(' ', '')}"
+                f"{' direct' if flight['DirectFlight'] else ''}"
+                f"{' ' + str(flight['RemainingSeats']) + ' left' if flight['RemainingSeats'] else ''}")
+        remaining = len(flights) - listed - 1
+        more = f"\n+{remaining} more" if remaining else ""
+        if sms_segments(message_body + line + more) > segment_budget:
+            # Make room for the "+N more" line if this flight does not fit
+            if listed == 0 or sms_segments(message_body + f"\n+{remaining + 1} more") > segment_budget:
+                return message_body, flights[:listed]
+            return message_body + f"\n+{remaining + 1} more", flights[:listed]
+        message_body += line
+    return message_body, flights
+
+def send_digest_notification(flights: List[Dict]) -> None:
+    """Queue a single SMS summarising every flight found in a cycle."""
+    if not flights:
+        print("No flights to send.")
+        return
+
+    get_notifier().submit(flights, format_digest_message)
+
+@dataclass
+class FlightChange:
+    """A difference between two searches of one parameter set."""
+    kind: str  # "added", "removed", "price_changed" or "seats_changed"
+    flight: Dict  # The flight now, or as last seen if it was removed
+    previous: Optional[Dict] = None
+
+def snapshot_key(flight: Dict) -> str:
+    """Return the key a flight is tracked under between searches: its route, date, cabin and source program."""
+    return f"{flight['RouteID']}|{flight['Date']}|{flight.get('Cabin', 'J')}|{flight.get('Source') or ''}"
+
+def diff_snapshots(previous: Dict[str, Dict], flights: List[Dict]) -> List[FlightChange]:
+    """Compare flights with the previous snapshot and return the changes, removals last."""
+    changes = []
+    current = {}
+    for flight in flights:
+        key = snapshot_key(flight)
+        current[key] = flight
+        before = previous.get(key)
+        if before is None:
+            changes.append(FlightChange("added", flight))
+        elif flight["MileageCost"] != before["MileageCost"]:
+            changes.append(FlightChange("price_changed", flight, before))
+        elif flight["RemainingSeats"] != before["RemainingSeats"]:
+            changes.append(FlightChange("seats_changed", flight, before))
+    for key, before in previous.items():
+        if key not in current:
+            changes.append(FlightChange("removed", before))
+    return changes
+
+class SnapshotStore:
+    """Keeps the latest filtered results of each parameter set to diff the next search against."""
+
+    def __init__(self, path: Optional[str] = SNAPSHOT_PATH):
+        self.path = path
+        self.snapshots: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def update(self, params: Dict, flights: List[Dict]) -> Optional[List[FlightChange]]:
+        """Replace the parameter set's snapshot with flights and return what changed.
+
+        Returns None the first time a parameter set is seen.
+        """
+        key = canonical_params_key(params)
+        with self._lock:
+            previous = self.snapshots.get(key)
+            self.snapshots[key] = {snapshot_key(flight): flight for flight in flights}
+        if previous is None:
+            return None
+        return diff_snapshots(previous, flights)
+
+    def load(self) -> None:
+        """Load snapshots saved by a previous run."""
+        try:
+            with open(self.path) as f:
+                self.snapshots = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading result snapshots: {e}")
+
+    def save(self) -> None:
+        """Persist snapshots, if a path is configured."""
+        if not self.path:
+            return
+        with self._lock:
+            snapshots = json.dumps(self.snapshots, separators=(",", ":"))
+        atomic_write(self.path, snapshots, "result snapshots")
+
+_snapshot_store = LazySingleton(SnapshotStore)
+
+def get_snapshot_store() -> SnapshotStore:
+    """Return the process-wide snapshot store."""
+    return _snapshot_store.get()
+
+def display_changes(changes: List[FlightChange], flight_count: int) -> None:
+    """Display what changed since a parameter set was last searched."""
+    if not changes:
+        print(f"No changes since the last search ({flight_count} flights still below the threshold).")
+        return
+    print(f"Changes since the last search ({flight_count} flights now below the threshold):")
+    for change in changes:
+        flight = change.flight
+        route = f"{flight['Origin']} -> {flight['Destination']} on {flight['Date']}"
+        if change.kind == "added":
+            print(f"  New: {route}: {flight['MileageCost']} miles, {flight['Airlines']}, "
+                  f"{flight['RemainingSeats']} seats")
+        elif change.kind == "removed":
+            print(f"  Gone: {route}")
+        elif change.kind == "price_changed":
+            print(f"  Price: {route}: {change.previous['MileageCost']} -> {flight['MileageCost']} miles")
+        else:
+            print(f"  Seats: {route}: {change.previous['RemainingSeats']} -> {flight['RemainingSeats']}")
+
+def alertable_flights(changes: List[FlightChange]) -> List[Dict]:
+    """Return the flights worth alerting on: new ones and those that got cheaper."""
+    return [change.flight for change in changes
+            if change.kind == "added"
+            or (change.kind == "price_changed" and change.flight["MileageCost"] < change.previous["MileageCost"])]
+
+SearchResult = Tuple[List[Dict], Optional[str]]
+
+def split_filter_rules(params: Dict) -> Tuple[Dict, Tuple[FilterRule, ...]]:
+    """Separate the filter rules, and other local settings, from the API query parameters.
+
+    If the rules watch cabins other than the one the query asks for, the
+    cabin is dropped from the query so a single call returns them all.
+    """
+    params = dict(params)
+    mileage_threshold = params.pop("mileage_threshold", 120000)  # Default to 120,000 if not specified
+    rules = parse_filter_rules(mileage_threshold, params.get("filter"))
+    for key in LOCAL_PARAMETER_KEYS:
+        params.pop(key, None)
+    query_cabin = QUERY_CABINS.get(str(params.get("cabin", "")).lower())
+    if query_cabin and any(cabin != query_cabin for rule in rules for cabin, _ in rule.max_costs):
+        del params["cabin"]
+    return params, rules
+
+def load_filter_rules(parameter_sets: List[Dict]) -> None:
+    """Parse and compile every parameter set's filter rule, raising ValueError naming the first bad set."""
+    for number, parameter_set in enumerate(parameter_sets, 1):
+        try:
+            compile_filter_rules(split_filter_rules(parameter_set)[1])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"parameter set {number}: {e}") from e
+
+def fetch_page(params: Dict, client: SeatsAeroClient) -> Dict:
+    """Fetch and parse a single page of search results."""
+    response_body = fetch_flights(params, client)
+    if not response_body:
+        raise SearchError("Failed to fetch data for this parameter set.")
+    # An unchanged (304) page reuses the result parsed last time
+    return parse_json(response_body)
+
+def page_flights(data: Dict) -> List[Dict]:
+    """Return the availability records in a page of search results."""
+    flights_list = data.get("data", [])
+    if not isinstance(flights_list, list):
+        raise SearchError("Unexpected response structure. No flights found.")
+    return flights_list
+
+def next_page_params(params: Dict, data: Dict, record_count: int) -> Optional[Dict]:
+    """Return the query for the page after data, or None if data was the last page.
+
+    data only needs the page's continuation fields (hasMore and cursor).
+    """
+    if not data.get("hasMore") or not record_count:
+        return None
+
+    next_params = dict(params)
+    next_params["skip"] = int(params.get("skip", 0)) + record_count
+    if data.get("cursor") is not None:
+        next_params["cursor"] = data["cursor"]
+    return next_params
+
+def iter_flight_pages(params: Dict, client: SeatsAeroClient, max_pages: int = SEARCH_MAX_PAGES) -> Iterator[List[Dict]]:
+    """Yield every page of availability records for a search.
+
+    The next page is requested in the background while the caller works on
+    the current one, so at most two pages are held in memory at a time.
+    """
+    params = dict(params)
+    params.setdefault("take", SEARCH_PAGE_SIZE)
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = prefetcher.submit(copy_context().run, fetch_page, params, client)
+        for page in range(1, max_pages + 1):
+            data = pending.result()
+            flights_list = page_flights(data)
+            params = next_page_params(params, data, len(flights_list))
+            if params is not None and page < max_pages:
+                try:
+                    search_time_left()
+                except SearchError:
+                    # This page is already downloaded; hand it over before giving up
+                    yield flights_list
+                    raise
+                pending = prefetcher.submit(copy_context().run, fetch_page, params, client)
+            elif params is not None:
+                print(f"Stopped after {max_pages} pages; more results are available.")
+            yield flights_list
+            if params is None or page == max_pages:
+                return
+
+class _TeeReader:
+    """File-like wrapper that keeps a copy of everything read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.chunks: List[bytes] = []
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.chunks.append(chunk)
+        return chunk
+
+def parse_page_stream(stream) -> Generator[Dict, None, Optional[Dict]]:
+    """Yield the records in data[] as they are parsed from a file-like stream.
+
+    Only the record being built is held in memory. Returns the page's
+    continuation fields (hasMore, cursor), which are empty for a last page,
+    or None if the body is not valid JSON.
+    """
+    continuation = {}
+    builder = None
+    try:
+        for prefix, event, value in ijson.parse(stream, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == "data.item" and event == "end_map":
+                    yield builder.value
+                    builder = None
+            elif prefix == "data.item" and event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix == "data" and event not in ("start_array", "end_array"):
+                raise SearchError("Unexpected response structure. No flights found.")
+            elif prefix in ("hasMore", "cursor"):
+                continuation[prefix] = value
+    except ijson.JSONError:
+        print("Error decoding JSON response.")
+        return None
+    return continuation
+
+def stream_page(params: Dict, client: SeatsAeroClient) -> Generator[Dict, None, Dict]:
+    """Yield the records in data[] as they are parsed off the socket.
+
+    The body is never decoded as a whole. Cached and unchanged (304) pages
+    are parsed from memory; fresh pages are copied as they stream past when
+    they need to be kept for the response cache or later conditional requests.
+    A connection lost mid-body counts against the circuit breaker and the
+    page is requested again, skipping the records already yielded.
+    """
+    if client.cache is not None:
+        cached_body = client.cache.get(params)
+        if cached_body is not None:
+            return (yield from parse_page_stream(io.BytesIO(cached_body))) or {}
+
+    yielded = 0
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = client.get("search", params, stream=True, headers=client.validators.request_headers(params))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching data: {e}")
+            raise SearchError("Failed to fetch data for this parameter set.")
+
+        if response.status_code == 304:
+            response.close()
+            response_body = client.validators.body(params)
+            if client.cache is not None:
+                client.cache.put(params, response_body)
+            records = parse_page_stream(io.BytesIO(response_body))
+            for _ in islice(records, yielded):
+                pass
+            return (yield from records) or {}
+
+        keep_body = ((client.cache is not None and client.cache.enabled)
+                     or "ETag" in response.headers or "Last-Modified" in response.headers)
+        with response:
+            response.raw.decode_content = True
+            stream = _TeeReader(response.raw) if keep_body else response.raw
+            records = parse_page_stream(stream)
+            position = 0
+            try:
+                while True:
+                    try:
+                        record = next(records)
+                    except StopIteration as done:
+                        continuation = done.value
+                        break
+                    position += 1
+                    if position > yielded:
+                        yielded = position
+                        yield record
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                # The headers arrived, so client.get() already counted this call as a success
+                if client.breaker is not None:
+                    client.breaker.record_failure()
+                delay = client.retry.next_delay(client.retry.classify_exception(e), attempt) if client.retry else None
+                if delay is None:
+                    print(f"Error fetching data: {e}")
+                    raise SearchError("Failed to fetch data for this parameter set.")
+                print(f"Retrying in {delay:.1f}s after error reading response: {e}")
+                if not wait_unless_shutdown(delay):
+                    check_shutdown()
+                continue
+
+        if continuation is None:
+            return {}
+        if keep_body:
+            response_body = b"".join(stream.chunks)
+            client.validators.update(params, response.headers, response_body)
+            if client.cache is not None:
+                client.cache.put(params, response_body)
+        return continuation
+
+def iter_flight_records(params: Dict, client: SeatsAeroClient, max_pages: int = SEARCH_MAX_PAGES) -> Iterator[Dict]:
+    """Yield every availability record for a search, streaming each page."""
+    params = dict(params)
+    params.setdefault("take", SEARCH_PAGE_SIZE)
+
+    for page in range(1, max_pages + 1):
+        search_time_left()
+        record_count = 0
+        records = stream_page(params, client)
+        while True:
+            try:
+                yield next(records)
+            except StopIteration as done:
+                continuation = done.value
+                break
+            record_count += 1
+
+        params = next_page_params(params, continuation, record_count)
+        if params is None:
+            return
+    print(f"Stopped after {max_pages} pages; more results are available.")
+
+def iter_flight_batches(params: Dict, client: SeatsAeroClient) -> Iterator[List[Dict]]:
+    """Yield a search's availability records in batches.
+
+    Streamed responses are cut into batches of STREAM_BATCH_SIZE records as
+    they are parsed; otherwise each batch is one page.
+    """
+    if STREAM_JSON and ijson is not None:
+        records = iter_flight_records(params, client)
+        while True:
+            batch = list(islice(records, STREAM_BATCH_SIZE))
+            if not batch:
+                return
+            yield batch
+    else:
+        yield from iter_flight_pages(params, client)
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class AvailabilityHistory:
+    """Records every availability record fetched, one row per cabin, in a SQLite database.
+
+    Records are queued by add() and written by a background thread in
+    batched transactions, so ingestion never holds up a search. The
+    database is in WAL mode so price_history() can read while it is written.
+    Replays of the same record (for example from the response cache) are
+    stored once.
+    """
+
+    def __init__(self, path: str = AVAILABILITY_HISTORY_PATH, batch_size: int = AVAILABILITY_HISTORY_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Tuple[float, List[Dict]]]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS availability ("
+                "record_id TEXT, route_id TEXT, origin TEXT NOT NULL, destination TEXT NOT NULL, "
+                "date TEXT NOT NULL, source TEXT NOT NULL, cabin TEXT NOT NULL, available INTEGER NOT NULL, "
+                "mileage_cost INTEGER, remaining_seats INTEGER, airlines TEXT, direct INTEGER, "
+                "updated_at TEXT, observed_at REAL NOT NULL)"
+            )
+            # Route lookups in observation order, and scans by observation time
+            conn.execute("CREATE INDEX IF NOT EXISTS availability_route ON availability "
+                         "(origin, destination, date, source, cabin, observed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS availability_observed_at ON availability (observed_at)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS availability_version ON availability "
+                         "(record_id, cabin, updated_at)")
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def rows(records: List[Dict], observed_at: float) -> Iterator[Tuple]:
+        """Yield a database row for each cabin of each record."""
+        for record in records:
+            route = record.get("Route") or {}
+            source = record.get("Source") or route.get("Source") or ""
+            for cabin in CABINS:
+                yield (record.get("ID"), record.get("RouteID"), route.get("OriginAirport") or "",
+                       route.get("DestinationAirport") or "", record.get("Date") or "", source, cabin,
+                       int(bool(record.get(f"{cabin}Available"))), _int_or_none(record.get(f"{cabin}MileageCost")),
+                       _int_or_none(record.get(f"{cabin}RemainingSeats")), record.get(f"{cabin}Airlines"),
+                       int(bool(record.get(f"{cabin}Direct"))), record.get("UpdatedAt"), observed_at)
+
+    def add(self, records: List[Dict]) -> None:
+        """Queue a batch of raw availability records to be written in the background."""
+        if not records:
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="availability-history", daemon=True)
+                self._worker.start()
+        self._queue.put((time.time(), records))
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                stopping = item is None
+                batches = [] if stopping else [item]
+                count = 0 if stopping else len(item[1])
+                # Write everything already queued in one transaction, up to batch_size records
+                while not stopping and count < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batches.append(item)
+                    count += len(item[1])
+                try:
+                    with conn:
+                        for observed_at, records in batches:
+                            conn.executemany(
+                                "INSERT OR IGNORE INTO availability (record_id, route_id, origin, destination, date, "
+                                "source, cabin, available, mileage_cost, remaining_seats, airlines, direct, "
+                                "updated_at, observed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                self.rows(records, observed_at)
+                            )
+                    with self._lock:
+                        self.written += count
+                except sqlite3.Error as e:
+                    print(f"Error writing availability history: {e}")
+                finally:
+                    for _ in range(len(batches) + stopping):
+                        self._queue.task_done()
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        self._queue.join()
+
+    def price_history(self, origin: str, destination: str, date: str, cabin: str = "J",
+                      source: Optional[str] = None, since: Optional[float] = None) -> List[Dict]:
+        """Return each observation of a route's cabin on a date, oldest first.
+
+        Optionally limited to one source and to observations made since a
+        Unix timestamp.
+        """
+        query = ("SELECT observed_at, source, available, mileage_cost, remaining_seats, airlines, direct "
+                 "FROM availability WHERE origin = ? AND destination = ? AND date = ?")
+        args: List[Any] = [origin, destination, date]
+        if source is not None:
+            query += " AND source = ?"
+            args.append(source)
+        query += " AND cabin = ?"
+        args.append(cabin)
+        if since is not None:
+            query += " AND observed_at >= ?"
+            args.append(since)
+        query += " ORDER BY observed_at"
+        with self._lock:
+            if self._reader is None:
+                self._reader = self._connect()
+            rows = self._reader.execute(query, args).fetchall()
+        return [{"ObservedAt": observed_at, "Source": row_source, "Available": bool(available),
+                 "MileageCost": mileage_cost, "RemainingSeats": remaining_seats, "Airlines": airlines,
+                 "DirectFlight": bool(direct)}
+                for observed_at, row_source, available, mileage_cost, remaining_seats, airlines, direct in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of records written and still queued."""
+        with self._lock:
+            return {"written": self.written, "pending": self._queue.qsize()}
+
+    def close(self) -> None:
+        """Write everything queued, then stop the writer and close the database."""
+        with self._lock:
+            worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._queue.put(None)
+            worker.join()
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+_availability_history = LazySingleton(AvailabilityHistory)
+
+def get_availability_history() -> AvailabilityHistory:
+    """Return the process-wide availability history."""
+    return _availability_history.get()
+
+def load_pyarrow():
+    """Import pyarrow on first use; returns None if it is not installed."""
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return None
+    return pyarrow
+
+# Archive columns holding a small set of repeated strings, stored dictionary-encoded
+ARCHIVE_DICTIONARY_COLUMNS = ("origin", "destination") + tuple(f"{cabin}_airlines" for cabin in CABINS)
+
+class ColumnarArchive:
+    """Appends raw availability records to a Parquet dataset for analytics.
+
+    Records are buffered as columns, one row per record with every cabin's
+    fields side by side, and written by flush() as a new file in each
+    observed_date=/source= partition they touch. Airport and airline
+    columns are dictionary-encoded.
+    """
+
+    def __init__(self, path: str, flush_records: int = ARCHIVE_FLUSH_RECORDS):
+        self.path = path
+        self.flush_records = flush_records
+        self.written = 0
+        self._columns: Dict[str, List] = {}
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def add(self, records: List[Dict]) -> None:
+        """Buffer a batch of raw availability records."""
+        now = datetime.now(timezone.utc)
+        observed_date = now.date().isoformat()
+        with self._lock:
+            columns = self._columns
+            for record in records:
+                route = record.get("Route") or {}
+                row = {
+                    "observed_at": now,
+                    "observed_date": observed_date,
+                    "source": record.get("Source") or route.get("Source") or "unknown",
+                    "record_id": record.get("ID"),
+                    "route_id": record.get("RouteID"),
+                    "origin": route.get("OriginAirport"),
+                    "destination": route.get("DestinationAirport"),
+                    "date": record.get("Date"),
+                    "updated_at": record.get("UpdatedAt"),
+                }
+                for cabin in CABINS:
+                    row[f"{cabin}_available"] = bool(record.get(f"{cabin}Available"))
+                    row[f"{cabin}_mileage_cost"] = _int_or_none(record.get(f"{cabin}MileageCost"))
+                    row[f"{cabin}_remaining_seats"] = _int_or_none(record.get(f"{cabin}RemainingSeats"))
+                    row[f"{cabin}_airlines"] = record.get(f"{cabin}Airlines")
+                    row[f"{cabin}_direct"] = bool(record.get(f"{cabin}Direct"))
+                for name, value in row.items():
+                    columns.setdefault(name, []).append(value)
+            self._buffered += len(records)
+            full = self._buffered >= self.flush_records
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records to the archive as new Parquet files."""
+        with self._lock:
+            columns, count = self._columns, self._buffered
+            self._columns, self._buffered = {}, 0
+        if not count:
+            return
+        pa = load_pyarrow()
+        if pa is None:
+            print("pyarrow is not installed; availability records were not archived.")
+            return
+        # Explicit types keep every file's schema the same, even when a column is all nulls
+        types = {"observed_at": pa.timestamp("us", tz="UTC")}
+        for cabin in CABINS:
+            types.update({f"{cabin}_available": pa.bool_(), f"{cabin}_mileage_cost": pa.int32(),
+                          f"{cabin}_remaining_seats": pa.int16(), f"{cabin}_direct": pa.bool_()})
+        arrays = {}
+        for name, values in columns.items():
+            array = pa.array(values, type=types.get(name, pa.string()))
+            if name in ARCHIVE_DICTIONARY_COLUMNS:
+                array = array.dictionary_encode()
+            arrays[name] = array
+        table = pa.table(arrays)
+        try:
+            pa.parquet.write_to_dataset(
+                table, self.path, partition_cols=["observed_date", "source"],
+                basename_template=f"part-{time.time_ns()}-{{i}}.parquet"
+            )
+        except (OSError, pa.ArrowException) as e:
+            print(f"Error writing availability archive: {e}")
+            return
+        with self._lock:
+            self.written += count
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of records archived and still buffered."""
+        with self._lock:
+            return {"written": self.written, "buffered": self._buffered}
+
+_archive = LazySingleton(lambda: ColumnarArchive(ARCHIVE_PATH))
+
+def get_archive() -> Optional[ColumnarArchive]:
+    """Return the process-wide columnar archive, or None if ARCHIVE_PATH is not set."""
+    if not ARCHIVE_PATH:
+        return None
+    return _archive.get()
+
+def record_availability(flights_list: List[Dict]) -> None:
+    """Pass raw availability records to the history and the archive, where enabled."""
+    archive = get_archive()
+    if archive is not None:
+        archive.add(flights_list)
+    if not AVAILABILITY_HISTORY:
+        return
+    try:
+        get_availability_history().add(flights_list)
+    except sqlite3.Error as e:
+        print(f"Error opening availability history: {e}")
+
+def airport_set(airports: Optional[str]) -> FrozenSet[str]:
+    """Parse a comma-separated airport list."""
+    return frozenset(code.strip().upper() for code in (airports or "").split(",") if code.strip())
+
+@dataclass
+class QueryPlan:
+    """One API query and the parameter sets whose results it covers."""
+    params: Dict
+    # (query params, filter rules) for each covered parameter set
+    members: List[Tuple[Dict, Tuple[FilterRule, ...]]]
+    # Position of each covered parameter set in the original list
+    indices: List[int]
+
+def merge_params(a: Dict, b: Dict, max_date_span_days: int = PLAN_MAX_DATE_SPAN_DAYS,
+                 max_airports: int = PLAN_MAX_AIRPORTS) -> Optional[Dict]:
+    """Return a single query covering both a and b, or None if they are not compatible.
+
+    Queries are compatible when every other parameter matches and they share
+    either their origins or their destinations, so the union never adds
+    unrelated routes. Date windows are widened to cover both, up to
+    max_date_span_days.
+    """
+    route_keys = ("origin_airport", "destination_airport", "start_date", "end_date")
+    if {k: v for k, v in a.items() if k not in route_keys} != {k: v for k, v in b.items() if k not in route_keys}:
+        return None
+
+    a_origins, a_destinations = airport_set(a.get("origin_airport")), airport_set(a.get("destination_airport"))
+    b_origins, b_destinations = airport_set(b.get("origin_airport")), airport_set(b.get("destination_airport"))
+    if a_origins == b_origins:
+        origins, destinations = a_origins, a_destinations | b_destinations
+    elif a_destinations == b_destinations:
+        origins, destinations = a_origins | b_origins, a_destinations
+    else:
+        return None
+    if len(origins) > max_airports or len(destinations) > max_airports:
+        return None
+
+    start_date, end_date = a.get("start_date"), a.get("end_date")
+    if (start_date, end_date) != (b.get("start_date"), b.get("end_date")):
+        try:
+            start_date = min(date.fromisoformat(a["start_date"]), date.fromisoformat(b["start_date"]))
+            end_date = max(date.fromisoformat(a["end_date"]), date.fromisoformat(b["end_date"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+        if (end_date - start_date).days + 1 > max_date_span_days:
+            return None
+        start_date, end_date = start_date.isoformat(), end_date.isoformat()
+
+    merged = dict(a)
+    merged["origin_airport"] = ", ".join(sorted(origins))
+    merged["destination_airport"] = ", ".join(sorted(destinations))
+    if start_date is not None:
+        merged["start_date"] = start_date
+    if end_date is not None:
+        merged["end_date"] = end_date
+    return merged
+
+def plan_queries(parameter_sets: List[Dict]) -> List[QueryPlan]:
+    """Coalesce compatible parameter sets into as few API queries as possible."""
+    plans: List[QueryPlan] = []
+    for idx, parameter_set in enumerate(parameter_sets):
+        params, rules = split_filter_rules(parameter_set)
+        for plan in plans:
+            merged = merge_params(plan.params, params)
+            if merged is not None:
+                plan.params = merged
+                plan.members.append((params, rules))
+                plan.indices.append(idx)
+                break
+        else:
+            plans.append(QueryPlan(params, [(params, rules)], [idx]))
+    return plans
+
+def single_plans(parameter_sets: List[Dict]) -> List[QueryPlan]:
+    """Plan one API query per parameter set."""
+    plans = []
+    for idx, parameter_set in enumerate(parameter_sets):
+        params, rules = split_filter_rules(parameter_set)
+        plans.append(QueryPlan(params, [(params, rules)], [idx]))
+    return plans
+
+def scope_filter(params: Dict) -> Callable[[Dict], bool]:
+    """Return a predicate selecting records that fall within a parameter set's own query."""
+    origins = airport_set(params.get("origin_airport"))
+    destinations = airport_set(params.get("destination_airport"))
+    start_date = params.get("start_date") or ""
+    end_date = params.get("end_date") or "9999-12-31"
+
+    def in_scope(flight: Dict) -> bool:
+        route = flight.get("Route") or {}
+        flight_date = (flight.get("Date") or "")[:10]
+        return (route.get("OriginAirport") in origins
+                and route.get("DestinationAirport") in destinations
+                and start_date <= flight_date <= end_date)
+
+    return in_scope
+
+class PlanFilter:
+    """Fans a merged query's records back out to each parameter set's filter."""
+
+    def __init__(self, plan: QueryPlan, engine: str = FILTER_ENGINE):
+        self.plan = plan
+        self.engine = engine
+        # A plan covering a single parameter set needs no scoping
+        self.scopes = [scope_filter(params) for params, _ in plan.members] if len(plan.members) > 1 else None
+        self.filtered_flights: List[List[Dict]] = [[] for _ in plan.members]
+
+    def add(self, flights_list: List[Dict]) -> None:
+        """Filter a batch of records for every covered parameter set."""
+        if use_vector_filter(len(flights_list), len(self.plan.members), self.engine):
+            try:
+                columns = FlightColumns(flights_list)
+            except ValueError:
+                pass
+            else:
+                for member, (params, rules) in enumerate(self.plan.members):
+                    scope = params if self.scopes is not None else None
+                    self.filtered_flights[member].extend(columns.select(rules, scope))
+                return
+        for member, (_, rules) in enumerate(self.plan.members):
+            if self.scopes is not None:
+                in_scope = self.scopes[member]
+                selected = [flight for flight in flights_list if in_scope(flight)]
+            else:
+                selected = flights_list
+            self.filtered_flights[member].extend(filter_flights(selected, rules, self.engine))
+
+    def results(self, error: Optional[str] = None) -> List[SearchResult]:
+        """Return a SearchResult per covered parameter set."""
+        return [(flights, error) for flights in self.filtered_flights]
+
+def search_plan(plan: QueryPlan, client: SeatsAeroClient) -> List[SearchResult]:
+    """Run one planned query and filter its results for every parameter set it covers.
+
+    Flights from pages fetched before an error are still returned alongside
+    the error message.
+    """
+    plan_filter = PlanFilter(plan)
+    deadline = _search_deadline.set(time.monotonic() + SEARCH_DEADLINE)
+    try:
+        for flights_list in iter_flight_batches(plan.params, client):
+            record_availability(flights_list)
+            plan_filter.add(flights_list)
+    except SearchError as e:
+        return plan_filter.results(str(e))
+    finally:
+        _search_deadline.reset(deadline)
+    return plan_filter.results()
+
+def search_parameter_set(params: Dict, client: SeatsAeroClient) -> SearchResult:
+    """Fetch, parse and filter flights for a single parameter set.
+
+    Returns the filtered flights and an error message, which is None on
+    success. Flights from pages fetched before an error are still returned.
+    """
+    return search_plan(single_plans([params])[0], client)[0]
+
+def load_aiohttp():
+    """Import aiohttp on first use; returns None if it is not installed."""
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp
+        except ImportError:
+            return None
+    return aiohttp
+
+class AsyncSeatsAeroClient:
+    """asyncio counterpart to SeatsAeroClient, built on aiohttp.
+
+    A single instance multiplexes every in-flight search over one connection
+    pool, so thousands of searches can run without a thread per request.
+    """
+
+    def __init__(self, api_key: Optional[str] = API_KEY, pool_size: int = HTTP_POOL_SIZE,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 cache: Optional[ResponseCache] = None, limiter: Optional[RateLimiter] = None,
+                 retry: Optional[RetryEngine] = None, breaker: Optional[CircuitBreaker] = None):
+        if load_aiohttp() is None:
+            raise RuntimeError("aiohttp is required for the asyncio search client")
+        self.base_url = SeatsAeroClient.base_url
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.validators = ValidatorStore()
+        self.session = aiohttp.ClientSession(
+            headers={
+                "accept": "application/json",
+                "Partner-Authorization": f"Bearer {api_key}"
+            },
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
         )
-        print(f"SMS sent successfully! Message SID: {message.sid}")
-    except Exception as e:
-        print(f"Error sending SMS: {e}")
 
-def main() -> None:
-    """Main function to execute the flight search, filtering, and notifications."""
-    # Define multiple parameter sets
-    parameter_sets = [
-        {
-            "origin_airport": "YVR, SEA",
-            "destination_airport": "SIN",
-            "cabin": "business",
-            "start_date": "2025-02-27",
-            "end_date": "2025-03-02",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 120000
-        },
-        {
-            "origin_airport": "HND, NRT, SIN, BKK, TPE, ICN",
-            "destination_airport": "FRA, ZRH, IST, DUB, ATH, LHR, FCO",
-            "cabin": "business",
-            "start_date": "2025-03-17",
-            "end_date": "2025-03-23",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 80000
-        },
-        {
-            "origin_airport": "HND, NRT, SIN, BKK, TPE, ICN",
-            "destination_airport": "JFK, EWR, SEA, LAX, SFO, YVR, ORD, YYZ, YUL, IAH",
-            "cabin": "business",
-            "start_date": "2025-03-17",
-            "end_date": "2025-03-23",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 110000
-        },
-        {
-            "origin_airport": "MEL, BNE, SYD, PER, ADL",
-            "destination_airport": "FRA, ZRH, IST, DUB, ATH, LHR, FCO",
-            "cabin": "business",
-            "start_date": "2025-03-17",
-            "end_date": "2025-03-23",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 120000
-        },
-        {
-            "origin_airport": "MEL, BNE, SYD, PER, ADL, AKL",
-            "destination_airport": "JFK, YVR, ORD, EWR, LAX, SFO",
-            "cabin": "business",
-            "start_date": "2025-03-17",
-            "end_date": "2025-03-23",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 120000
-        },
-        {
-            "origin_airport": "EWR",
-            "destination_airport": "YVR",
-            "cabin": "business",
-            "start_date": "2025-03-17",
-            "end_date": "2025-03-23",
-            "take": 500,
-            "order_by": "lowest_mileage",
-            "mileage_threshold": 50000
-        }
-    ]
-
-    for idx, params in enumerate(parameter_sets, start=1):
-        print(f"\nProcessing parameter set {idx}...\n")
-
-        # Extract the mileage threshold for this parameter set
-        mileage_threshold = params.pop("mileage_threshold", 120000)  # Default to 120,000 if not specified
-        
-        # Fetch and parse flight data
-        response_text = fetch_flights(params)
-        if response_text:
-            data = parse_json(response_text)
-            flights_list = data.get("data", [])
-            
-            if isinstance(flights_list, list):
-                filtered_flights = filter_flights(flights_list, mileage_threshold)
-                display_flights(filtered_flights)
-                
-                # Only send SMS if there are flights that meet my criteria
-                if filtered_flights:
-                    print("Flights found. Sending SMS notification...")
-                    send_sms_notification(filtered_flights)
-                else:
-                    print("No flights meet the criteria. SMS not sent.")
+    async def get_body(self, path: str, params: Dict[str, str]) -> bytes:
+        """Issue a conditional GET request and return the raw body, raising on HTTP errors.
+
+        A 304 Not Modified returns the body stored from the previous response.
+        Transient failures are retried according to the client's retry
+        engine. While the circuit breaker is open, raises CircuitOpenError
+        without calling the API.
+        """
+        if self.breaker is None:
+            return await self._get_body_with_retries(path, params)
+
+        self.breaker.before_call()
+        try:
+            body = await self._get_body_with_retries(path, params)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429 or e.status >= 500:
+                self.breaker.record_failure()
             else:
-                print("Unexpected response structure. No flights found.")
+                self.breaker.record_success()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancellation and quota errors say nothing about the API; free a half-open probe
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return body
+
+    async def _get_body_with_retries(self, path: str, params: Dict[str, str]) -> bytes:
+        headers = self.validators.request_headers(params)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = search_time_left()
+            timeout = self.session.timeout
+            if remaining is not None:
+                timeout = aiohttp.ClientTimeout(total=remaining, sock_connect=timeout.sock_connect,
+                                                sock_read=timeout.sock_read)
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            try:
+                async with self.session.get(f"{self.base_url}/{path}", params=params, headers=headers,
+                                            timeout=timeout) as response:
+                    if self.limiter is not None:
+                        self.limiter.update(response.status, response.headers)
+                    delay = None
+                    if self.retry is not None:
+                        delay = self.retry.next_delay(self.retry.classify_status(response.status), attempt,
+                                                      retry_after_seconds(response.headers))
+                    if delay is None:
+                        response.raise_for_status()
+                        if response.status == 304:
+                            body = self.validators.body(params)
+                        else:
+                            body = await response.read()
+                            self.validators.update(params, response.headers, body)
+                        if self.retry is not None:
+                            self.retry.record(attempt, succeeded=True)
+                        return body
+                print(f"Retrying in {delay:.1f}s after HTTP {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = self.retry.next_delay(self.retry.classify_exception(e), attempt) if self.retry else None
+                if delay is None:
+                    if self.retry is not None:
+                        self.retry.record(attempt, succeeded=False)
+                    raise
+                print(f"Retrying in {delay:.1f}s after error: {e}")
+            if not await async_wait_unless_shutdown(delay):
+                check_shutdown()
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        await self.session.close()
+
+    async def __aenter__(self) -> "AsyncSeatsAeroClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+async def async_fetch_flights(params: Dict[str, str], client: AsyncSeatsAeroClient) -> Optional[bytes]:
+    """Fetch flights from the Seats.aero API without blocking the event loop."""
+    if client.cache is not None:
+        cached_body = client.cache.get(params)
+        if cached_body is not None:
+            return cached_body
+
+    try:
+        response_body = await client.get_body("search", params)
+        if client.cache is not None:
+            client.cache.put(params, response_body)
+        return response_body
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching data: {e}")
+        return None
+
+async def async_fetch_page(params: Dict, client: AsyncSeatsAeroClient) -> Dict:
+    """Fetch and parse a single page of search results without blocking the event loop."""
+    response_body = await async_fetch_flights(params, client)
+    if not response_body:
+        raise SearchError("Failed to fetch data for this parameter set.")
+    return parse_json(response_body)
+
+async def async_iter_flight_pages(params: Dict, client: AsyncSeatsAeroClient,
+                                  max_pages: int = SEARCH_MAX_PAGES) -> AsyncIterator[List[Dict]]:
+    """asyncio counterpart to iter_flight_pages, prefetching one page ahead."""
+    params = dict(params)
+    params.setdefault("take", SEARCH_PAGE_SIZE)
+
+    pending = asyncio.ensure_future(async_fetch_page(params, client))
+    try:
+        for page in range(1, max_pages + 1):
+            data = await pending
+            flights_list = page_flights(data)
+            params = next_page_params(params, data, len(flights_list))
+            if params is not None and page < max_pages:
+                try:
+                    search_time_left()
+                except SearchError:
+                    # This page is already downloaded; hand it over before giving up
+                    yield flights_list
+                    raise
+                pending = asyncio.ensure_future(async_fetch_page(params, client))
+            elif params is not None:
+                print(f"Stopped after {max_pages} pages; more results are available.")
+            yield flights_list
+            if params is None or page == max_pages:
+                return
+    finally:
+        pending.cancel()
+
+async def async_search_plan(plan: QueryPlan, client: AsyncSeatsAeroClient) -> List[SearchResult]:
+    """asyncio counterpart to search_plan.
+
+    Only the fetch is asynchronous; parsing and filtering reuse parse_json and
+    filter_flights so results have exactly the same shape as the sync path.
+    """
+    plan_filter = PlanFilter(plan)
+    deadline = _search_deadline.set(time.monotonic() + SEARCH_DEADLINE)
+    try:
+        async for flights_list in async_iter_flight_pages(plan.params, client):
+            record_availability(flights_list)
+            plan_filter.add(flights_list)
+    except SearchError as e:
+        return plan_filter.results(str(e))
+    finally:
+        _search_deadline.reset(deadline)
+    return plan_filter.results()
+
+async def async_search_parameter_set(params: Dict, client: AsyncSeatsAeroClient) -> SearchResult:
+    """Fetch, parse and filter flights for a single parameter set."""
+    return (await async_search_plan(single_plans([params])[0], client))[0]
+
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_client: Optional[AsyncSeatsAeroClient] = None
+
+def run_async(coroutine):
+    """Run a coroutine on the process-wide event loop.
+
+    The loop outlives each call so the async client's warm connections can
+    be reused from one cycle to the next.
+    """
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(coroutine)
+
+def get_async_client(pool_size: int = SEARCH_CONCURRENCY) -> AsyncSeatsAeroClient:
+    """Return the process-wide async client; must be called from run_async."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncSeatsAeroClient(pool_size=pool_size, cache=get_response_cache(),
+                                             limiter=get_rate_limiter(), retry=get_retry_engine(),
+                                             breaker=get_circuit_breaker())
+    return _async_client
+
+async def async_search_plans(plans: List[QueryPlan], concurrency: int = SEARCH_CONCURRENCY) -> List[List[SearchResult]]:
+    """Run every planned query on the event loop and return the results in order."""
+    client = get_async_client(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(plan: QueryPlan) -> List[SearchResult]:
+        async with semaphore:
+            return await async_search_plan(plan, client)
+
+    return await asyncio.gather(*(run_one(plan) for plan in plans))
+
+def run_plans(plans: List[QueryPlan], client: SeatsAeroClient, mode: str, concurrency: int) -> List[List[SearchResult]]:
+    """Run planned queries and return each plan's results, in plan order.
+
+    mode is one of "sequential", "threads" or "asyncio"; concurrency caps the
+    number of queries in flight at once.
+    """
+    concurrency = max(1, concurrency)
+
+    if mode == "sequential":
+        return [search_plan(plan, client) for plan in plans]
+
+    if mode == "threads":
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda plan: search_plan(plan, client), plans))
+
+    if mode == "asyncio" and load_aiohttp() is not None:
+        return run_async(async_search_plans(plans, concurrency))
+
+    if mode == "asyncio":
+        # Without aiohttp, drive the blocking client from worker threads instead
+        async def run() -> List[List[SearchResult]]:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_one(plan: QueryPlan) -> List[SearchResult]:
+                async with semaphore:
+                    return await asyncio.to_thread(search_plan, plan, client)
+
+            return await asyncio.gather(*(run_one(plan) for plan in plans))
+
+        return run_async(run())
+
+    raise ValueError(f"Unknown search mode: {mode}")
+
+def search_all(parameter_sets: List[Dict], client: SeatsAeroClient, mode: str = "threads",
+               concurrency: int = SEARCH_CONCURRENCY) -> List[SearchResult]:
+    """Run every parameter set and return the results in parameter-set order.
+
+    With QUERY_PLANNER enabled, compatible parameter sets share one API query.
+    """
+    plans = plan_queries(parameter_sets) if QUERY_PLANNER else single_plans(parameter_sets)
+    if len(plans) < len(parameter_sets):
+        print(f"Merged {len(parameter_sets)} parameter sets into {len(plans)} API queries.")
+
+    results: List[SearchResult] = [([], None)] * len(parameter_sets)
+    for plan, plan_results in zip(plans, run_plans(plans, client, mode, concurrency)):
+        for idx, result in zip(plan.indices, plan_results):
+            results[idx] = result
+    return results
+
+# Define multiple parameter sets. Besides the API query, each set may give a
+# mileage_threshold, a "filter" entry of one rule or a list of rules (see
+# parse_filter_rule) to match other cabins, programs or airlines from the same
+# API call, and, for --daemon, an interval_minutes polling interval.
+PARAMETER_SETS = [
+    {
+        "origin_airport": "YVR, SEA",
+        "destination_airport": "SIN",
+        "cabin": "business",
+        "start_date": "2025-02-27",
+        "end_date": "2025-03-02",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 120000
+    },
+    {
+        "origin_airport": "HND, NRT, SIN, BKK, TPE, ICN",
+        "destination_airport": "FRA, ZRH, IST, DUB, ATH, LHR, FCO",
+        "cabin": "business",
+        "start_date": "2025-03-17",
+        "end_date": "2025-03-23",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 80000
+    },
+    {
+        "origin_airport": "HND, NRT, SIN, BKK, TPE, ICN",
+        "destination_airport": "JFK, EWR, SEA, LAX, SFO, YVR, ORD, YYZ, YUL, IAH",
+        "cabin": "business",
+        "start_date": "2025-03-17",
+        "end_date": "2025-03-23",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 110000
+    },
+    {
+        "origin_airport": "MEL, BNE, SYD, PER, ADL",
+        "destination_airport": "FRA, ZRH, IST, DUB, ATH, LHR, FCO",
+        "cabin": "business",
+        "start_date": "2025-03-17",
+        "end_date": "2025-03-23",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 120000
+    },
+    {
+        "origin_airport": "MEL, BNE, SYD, PER, ADL, AKL",
+        "destination_airport": "JFK, YVR, ORD, EWR, LAX, SFO",
+        "cabin": "business",
+        "start_date": "2025-03-17",
+        "end_date": "2025-03-23",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 120000
+    },
+    {
+        "origin_airport": "EWR",
+        "destination_airport": "YVR",
+        "cabin": "business",
+        "start_date": "2025-03-17",
+        "end_date": "2025-03-23",
+        "order_by": "lowest_mileage",
+        "mileage_threshold": 50000
+    }
+]
+
+def report_results(results: List[SearchResult], set_numbers: List[int],
+                   parameter_sets: Optional[List[Dict]] = None) -> None:
+    """Display results and send notifications in parameter-set order.
+
+    With SNAPSHOT_DIFF and parameter_sets given, only changes since each
+    set's previous search are displayed, and only new or cheaper flights
+    are alerted on. In SMS_DIGEST mode, one message covering every set is
+    sent at the end.
+    """
+    cycle_flights: List[Dict] = []
+    for idx, (number, (filtered_flights, error)) in enumerate(zip(set_numbers, results)):
+        print(f"\nProcessing parameter set {number}...\n")
+
+        if error:
+            print(error)
+            if not filtered_flights:
+                continue
+
+        # Partial results after an error would show up as spurious removals, so they aren't diffed
+        changes = None
+        if SNAPSHOT_DIFF and parameter_sets is not None and not error:
+            changes = get_snapshot_store().update(parameter_sets[idx], filtered_flights)
+        if changes is None:
+            display_flights(filtered_flights)
+            candidates = filtered_flights
+        else:
+            display_changes(changes, len(filtered_flights))
+            candidates = alertable_flights(changes)
+
+        # Only send SMS if there are flights that meet my criteria and haven't been sent before
+        new_flights = unalerted_flights(candidates)
+        if filtered_flights and not new_flights:
+            print("No new or cheaper flights since the last alert. SMS not sent.")
+        elif new_flights and SMS_DIGEST:
+            print("Flights found. Adding them to this cycle's SMS digest...")
+            cycle_flights.extend(new_flights)
+        elif new_flights:
+            print("Flights found. Sending SMS notification...")
+            send_sms_notification(new_flights)
         else:
-            print("Failed to fetch data for this parameter set.")
+            print("No flights meet the criteria. SMS not sent.")
+
+    if cycle_flights:
+        print("\nSending SMS digest for this cycle...")
+        send_digest_notification(cycle_flights)
+
+def report_stats(client: SeatsAeroClient) -> None:
+    """Print connection, cache, retry, circuit breaker and quota statistics."""
+    stats = client.connection_stats()
+    if stats["requests"]:
+        print(f"\nHTTP requests: {stats['requests']} "
+              f"(new connections: {stats['new_connections']}, reused: {stats['reused_connections']})")
+
+    cache = get_response_cache()
+    if cache.enabled:
+        cache_stats = cache.stats()
+        print(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['entries']} entries")
+
+    retry_stats = get_retry_engine().stats()
+    if retry_stats["retries_by_class"] or retry_stats["gave_up"]:
+        print(f"Retries: {retry_stats['retries_by_class']}, attempts per call: "
+              f"{retry_stats['attempts_per_call']}, gave up: {retry_stats['gave_up']}")
+
+    breaker_stats = get_circuit_breaker().stats()
+    if breaker_stats["state"] != CircuitBreaker.CLOSED or breaker_stats["fast_failures"]:
+        print(f"Circuit breaker: {breaker_stats['state']}, "
+              f"{breaker_stats['fast_failures']} searches skipped while open")
+
+    notifier = _notifier.peek()
+    if notifier is not None:
+        sms_stats = notifier.stats()
+        print(f"SMS alerts: {sms_stats['sent']} sent, {sms_stats['failed']} failed, {sms_stats['pending']} queued")
+
+    history = _availability_history.peek()
+    if history is not None:
+        history_stats = history.stats()
+        print(f"Availability history: {history_stats['written']} records written, "
+              f"{history_stats['pending']} batches queued")
+
+    archive = _archive.peek()
+    if archive is not None:
+        archive_stats = archive.stats()
+        print(f"Availability archive: {archive_stats['written']} records archived")
+
+    alert_store = _alert_store.peek()
+    if alert_store is not None:
+        alert_stats = alert_store.stats()
+        print(f"Alert history: {alert_stats['entries']} flights remembered, "
+              f"{alert_stats['suppressed']} already-alerted flights not re-sent")
+
+    quota = get_rate_limiter().stats()
+    print(f"API quota: {quota['used']} of {quota['quota']} calls used today, {quota['remaining']} remaining")
+
+def save_state() -> None:
+    """Persist the response cache, API quota usage and result snapshots, and archive the cycle's records."""
+    get_response_cache().save()
+    get_rate_limiter().save()
+    snapshot_store = _snapshot_store.peek()
+    if snapshot_store is not None:
+        snapshot_store.save()
+    archive = _archive.peek()
+    if archive is not None:
+        archive.flush()
+
+def shutdown(drain_timeout: float = SMS_DRAIN_TIMEOUT) -> None:
+    """Save state and close every client, waiting up to drain_timeout seconds for queued alerts."""
+    global _event_loop, _async_client
+    # State goes first so it survives even if the process is killed while alerts drain
+    save_state()
+    notifier = _notifier.peek()
+    if notifier is not None:
+        notifier.close(drain_timeout)
+    history = _availability_history.reset()
+    if history is not None:
+        history.close()
+    alert_store = _alert_store.reset()
+    if alert_store is not None:
+        alert_store.close()
+    get_client().close()
+    if _event_loop is not None:
+        if _async_client is not None:
+            _event_loop.run_until_complete(_async_client.close())
+            _async_client = None
+        _event_loop.close()
+        _event_loop = None
+
+class PollingScheduler:
+    """Sets each parameter set's polling interval from its priority and the remaining quota.
+
+    Priority combines how soon the set's travel window starts with how often
+    it has produced flights under its threshold. Intervals are the set's
+    interval_minutes divided by its priority relative to the average, then
+    stretched evenly if polling at that pace would use more calls than the
+    daily quota has left. Sets whose travel window has ended stop polling.
+    """
+
+    def __init__(self, parameter_sets: List[Dict], limiter: RateLimiter, path: Optional[str] = POLL_HISTORY_PATH):
+        self.parameter_sets = parameter_sets
+        self.limiter = limiter
+        self.path = path
+        self.keys = [canonical_params_key(params) for params in parameter_sets]
+        # Per set: EWMA of polls that found flights, and of API calls per poll
+        self.history: Dict[str, Dict[str, float]] = {}
+        if path:
+            self.load()
+
+    def _history(self, idx: int) -> Dict[str, float]:
+        return self.history.setdefault(self.keys[idx], {"hit_rate": 0.5, "calls_per_poll": 1.0, "polls": 0})
+
+    def record(self, idx: int, found_flights: bool, calls: float) -> None:
+        """Update a set's history after it was polled."""
+        history = self._history(idx)
+        alpha = POLL_HISTORY_WEIGHT
+        history["hit_rate"] = (1 - alpha) * history["hit_rate"] + alpha * (1.0 if found_flights else 0.0)
+        history["calls_per_poll"] = (1 - alpha) * history["calls_per_poll"] + alpha * calls
+        history["polls"] += 1
+
+    def priority(self, idx: int, today: Optional[date] = None) -> float:
+        """Return a set's priority; 0 means its travel window has ended."""
+        params = self.parameter_sets[idx]
+        today = today or date.today()
+        try:
+            if params.get("end_date") and date.fromisoformat(params["end_date"]) < today:
+                return 0.0
+            days_away = (date.fromisoformat(params["start_date"]) - today).days if params.get("start_date") else 0
+        except ValueError:
+            days_away = 0
+        # Roughly halves for every month further out
+        proximity = 1.0 / (1.0 + max(days_away, 0) / 30.0)
+        return proximity * (0.5 + self._history(idx)["hit_rate"])
+
+    def intervals(self) -> List[Optional[float]]:
+        """Return each set's polling interval in seconds, or None if it should not be polled."""
+        priorities = [self.priority(idx) for idx in range(len(self.parameter_sets))]
+        active = [p for p in priorities if p > 0]
+        if not active:
+            return [None] * len(priorities)
+        mean_priority = sum(active) / len(active)
+
+        intervals: List[Optional[float]] = []
+        for idx, priority in enumerate(priorities):
+            if priority <= 0:
+                intervals.append(None)
+                continue
+            base = float(self.parameter_sets[idx].get("interval_minutes", DEFAULT_INTERVAL_MINUTES)) * 60
+            interval = base * mean_priority / priority
+            intervals.append(min(max(interval, MIN_INTERVAL_MINUTES * 60), MAX_INTERVAL_MINUTES * 60))
+
+        # Stretch every interval if this pace would outrun the quota left today
+        now = datetime.now(timezone.utc)
+        seconds_left = (datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+                        - now).total_seconds()
+        calls_per_second = sum(self._history(idx)["calls_per_poll"] / interval
+                               for idx, interval in enumerate(intervals) if interval)
+        budget_per_second = self.limiter.stats()["remaining"] / max(seconds_left, 1.0)
+        if calls_per_second > budget_per_second:
+            stretch = calls_per_second / max(budget_per_second, 1e-9)
+            intervals = [min(interval * stretch, MAX_INTERVAL_MINUTES * 60) if interval else None
+                         for interval in intervals]
+        return intervals
+
+    def load(self) -> None:
+        """Load polling history saved by a previous run."""
+        try:
+            with open(self.path) as f:
+                self.history = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading polling history: {e}")
+
+    def save(self) -> None:
+        """Persist polling history, if a path is configured."""
+        if not self.path:
+            return
+        atomic_write(self.path, json.dumps(self.history), "polling history")
+
+def run_cycle(parameter_sets: List[Dict], client: SeatsAeroClient,
+              set_numbers: Optional[List[int]] = None) -> List[SearchResult]:
+    """Search, report and notify for a batch of parameter sets."""
+    set_numbers = set_numbers or list(range(1, len(parameter_sets) + 1))
+    results = search_all(parameter_sets, client, SEARCH_MODE, SEARCH_CONCURRENCY)
+    report_results(results, set_numbers, parameter_sets)
+    save_state()
+    report_stats(client)
+    return results
+
+def run_daemon(parameter_sets: List[Dict], stop: Optional[threading.Event] = None) -> None:
+    """Poll each parameter set on its own interval until SIGTERM or SIGINT.
+
+    Runs are scheduled on a fixed monotonic timetable, so slow cycles do not
+    push later runs back; runs missed entirely are skipped rather than
+    queued. Clients, caches and connections stay warm between cycles. With
+    PRIORITY_SCHEDULING, intervals are re-planned after every cycle by a
+    PollingScheduler.
+    """
+    stop = stop or threading.Event()
+    stop_requested_at = []
+
+    def request_stop(signum, frame) -> None:
+        print(f"\nReceived signal {signum}; abandoning in-flight searches and shutting down...")
+        stop_requested_at.append(time.monotonic())
+        _shutdown_requested.set()
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # A cached response outlives the fetch that made it, so with a TTL near the
+    # polling interval the next poll would be served the previous poll's results
+    get_response_cache().ttl = 0
+    client = get_client()
+    # A request already in flight at SIGTERM must finish within half the grace period
+    client.timeout = tuple(min(t, SHUTDOWN_GRACE_PERIOD / 2) for t in client.timeout)
+    limiter = get_rate_limiter()
+    scheduler = PollingScheduler(parameter_sets, limiter) if PRIORITY_SCHEDULING else None
+    if scheduler is not None:
+        intervals = scheduler.intervals()
+    else:
+        intervals = [float(params.get("interval_minutes", DEFAULT_INTERVAL_MINUTES)) * 60 for params in parameter_sets]
+    now = time.monotonic()
+    next_runs = [now if interval else None for interval in intervals]
+    for idx, interval in enumerate(intervals):
+        if interval is None:
+            print(f"Parameter set {idx + 1} has passed its end date; not polling it.")
+
+    while not stop.is_set():
+        now = time.monotonic()
+        due = [idx for idx, next_run in enumerate(next_runs) if next_run is not None and next_run <= now]
+        if due:
+            print(f"\n=== {datetime.now().isoformat(timespec='seconds')}: "
+                  f"polling parameter sets {', '.join(str(idx + 1) for idx in due)} ===")
+            calls_before = limiter.stats()["used"]
+            try:
+                results = run_cycle([parameter_sets[idx] for idx in due], client, [idx + 1 for idx in due])
+            except Exception as e:
+                print(f"Error during polling cycle: {e}")
+                results = None
+
+            if scheduler is not None:
+                if results is not None:
+                    calls = (limiter.stats()["used"] - calls_before) / len(due)
+                    for idx, (filtered_flights, _) in zip(due, results):
+                        scheduler.record(idx, bool(filtered_flights), calls)
+                    scheduler.save()
+                intervals = scheduler.intervals()
+
+            now = time.monotonic()
+            for idx in due:
+                if intervals[idx] is None:
+                    print(f"Parameter set {idx + 1} has passed its end date; no longer polling it.")
+                    next_runs[idx] = None
+                    continue
+                next_runs[idx] += intervals[idx]
+                if next_runs[idx] <= now:
+                    missed = int((now - next_runs[idx]) // intervals[idx]) + 1
+                    next_runs[idx] += missed * intervals[idx]
+
+        pending = [next_run for next_run in next_runs if next_run is not None]
+        if not pending:
+            print("No parameter sets left to poll; idling until shutdown.")
+            stop.wait()
+            break
+        stop.wait(max(min(pending) - time.monotonic(), 0))
+
+    # Queued alerts get whatever is left of the grace period after the interrupted cycle
+    elapsed = time.monotonic() - stop_requested_at[0] if stop_requested_at else 0.0
+    shutdown(min(SMS_DRAIN_TIMEOUT, max(SHUTDOWN_GRACE_PERIOD - elapsed - 1, 0)))
+    print("Shut down cleanly.")
+
+def measure_imports(statement: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Run statement in a fresh interpreter with -X importtime.
+
+    Returns the wall-clock seconds the interpreter took and the import time
+    spent in each top-level package (its modules' own time, so nested
+    imports are not double counted), slowest first.
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed = time.perf_counter() - started
+
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        package = parts[2].strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(parts[0]) / 1e6
+    return elapsed, sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+def profile_startup() -> None:
+    """Print interpreter start-up and import time, broken down by package."""
+    for label, statement in (("Worker start-up (import award_search)", "import award_search"),
+                             ("Twilio, loaded on first SMS (import twilio.rest)", "import twilio.rest")):
+        elapsed, packages = measure_imports(statement)
+        print(f"{label}: {elapsed * 1000:.0f} ms total")
+        for package, seconds in packages[:10]:
+            print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+
+def print_price_history(origin: str, destination: str, date: str, cabin: str = "J") -> None:
+    """Print every recorded observation of a route's cabin on a date."""
+    observations = get_availability_history().price_history(origin, destination, date, cabin)
+    if not observations:
+        print(f"No recorded availability for {origin} -> {destination} on {date} in {cabin}.")
+        return
+    print(f"{cabin} availability for {origin} -> {destination} on {date}:")
+    for observation in observations:
+        observed = datetime.fromtimestamp(observation["ObservedAt"]).isoformat(timespec="seconds")
+        if observation["Available"]:
+            print(f"  {observed} {observation['Source']}: {observation['MileageCost']} miles, "
+                  f"{observation['RemainingSeats']} seats, {observation['Airlines']}")
+        else:
+            print(f"  {observed} {observation['Source']}: not available")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Main function to execute the flight search, filtering, and notifications."""
+    parser = argparse.ArgumentParser(description="Search Seats.aero for award availability and send SMS alerts.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running, polling each parameter set on its own interval")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report interpreter start-up and import time by package, then exit")
+    parser.add_argument("--price-history", nargs=3, metavar=("ORIGIN", "DESTINATION", "DATE"),
+                        help="print the recorded mileage cost history of a route on a date, then exit")
+    parser.add_argument("--cabin", choices=CABINS, default="J", help="cabin for --price-history (default: J)")
+    args = parser.parse_args(argv)
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    if args.price_history:
+        print_price_history(*args.price_history, cabin=args.cabin)
+        return
+
+    try:
+        load_filter_rules(PARAMETER_SETS)
+    except ValueError as e:
+        print(f"Invalid filter rule in {e}")
+        return
+
+    if args.daemon:
+        run_daemon(PARAMETER_SETS)
+        return
+
+    run_cycle(PARAMETER_SETS, get_client())
+    shutdown()
 
 if __name__ == "__main__":
     main()
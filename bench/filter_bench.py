@@ -0,0 +1,73 @@
+"""Compare the scalar and NumPy filter engines on synthetic availability records.
+
+Usage: python bench/filter_bench.py [SIZE ...]
+"""
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import award_search
+
+def synthetic_records(count: int, seed: int = 0) -> List[Dict]:
+    """Return count made-up availability records with a realistic mix of cabins, sources and costs."""
+    rng = random.Random(seed)
+    airports = ["YVR", "YYZ", "SIN", "NRT", "LHR", "FRA", "DEL", "HKG", "ICN", "CDG"]
+    records = []
+    for i in range(count):
+        origin, destination = rng.sample(airports, 2)
+        available = rng.random() < 0.4
+        records.append({
+            "ID": str(i),
+            "RouteID": f"{origin}{destination}",
+            "Route": {"OriginAirport": origin, "DestinationAirport": destination},
+            "Date": f"2025-03-{rng.randint(1, 28):02d}",
+            "Source": rng.choice(["aeroplan", "aeroplan", "united", "lifemiles"]),
+            "JAvailable": available,
+            "JMileageCost": str(rng.randint(40, 200) * 1000) if available else "0",
+            "JAirlines": rng.choice(["LH", "AC", "NH", "AI", "UA, AC", "SQ"]) if available else "",
+            "JDirect": rng.random() < 0.3,
+            "JRemainingSeats": rng.randint(1, 9) if available else 0,
+        })
+    return records
+
+def benchmark_filter(sizes: Tuple[int, ...] = (10_000, 100_000, 1_000_000), set_counts: Tuple[int, ...] = (1, 4),
+                     threshold: int = 120000) -> None:
+    """Time the scalar and NumPy filter engines on synthetic batches.
+
+    Each batch is filtered for set_counts parameter sets sharing one merged
+    query, as PlanFilter does.
+    """
+    if award_search.load_numpy() is None:
+        print("numpy is not installed; only the scalar engine is available.")
+        return
+    routes = [("YVR", "LHR, FRA"), ("YVR", "NRT, HKG"), ("YYZ", "LHR, CDG"), ("YYZ", "DEL, SIN")]
+    for size in sizes:
+        records = synthetic_records(size)
+        for set_count in set_counts:
+            members = [({"origin_airport": origin, "destination_airport": destination,
+                         "start_date": "2025-03-01", "end_date": "2025-03-21"}, threshold)
+                       for origin, destination in routes[:set_count]]
+            plan = award_search.QueryPlan({}, members, list(range(set_count)))
+            timings = {}
+            for engine in ("scalar", "numpy"):
+                best = float("inf")
+                for _ in range(3):
+                    plan_filter = award_search.PlanFilter(plan, engine)
+                    started = time.perf_counter()
+                    plan_filter.add(records)
+                    best = min(best, time.perf_counter() - started)
+                timings[engine] = best
+            matched = sum(len(flights) for flights, _ in plan_filter.results())
+            print(f"{size:>9} records, {set_count} sets, {matched} matches: "
+                  f"scalar {timings['scalar'] * 1000:8.1f} ms, numpy {timings['numpy'] * 1000:8.1f} ms "
+                  f"({timings['scalar'] / timings['numpy']:.1f}x)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        benchmark_filter(tuple(int(size) for size in sys.argv[1:]))
+    else:
+        benchmark_filter()
@@ -0,0 +1,64 @@
+"""Compare the JSON decoders parse_json can use on search response bodies.
+
+Times json.loads on the decoded text (the old path), json.loads on the raw
+bytes, and orjson.loads on the raw bytes when orjson is installed. Bodies
+are saved responses given on the command line, or else pages of
+tests/mock_server.py's records.
+
+Usage: python bench/json_bench.py [RESPONSE.json ...]
+"""
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import award_search  # noqa: E402
+from mock_server import make_records  # noqa: E402
+
+def mock_payloads(sizes: Tuple[int, ...] = (100, 500, 2000)) -> List[Tuple[str, bytes]]:
+    """Return (label, body) for a single-page response of each size, shaped as the mock server sends it."""
+    payloads = []
+    for size in sizes:
+        page = {"data": make_records(size), "count": size, "hasMore": False, "cursor": None}
+        body = json.dumps(page).encode()
+        payloads.append((f"{size} records", body))
+    return payloads
+
+def best_time(decode: Callable[[], object], runs: int) -> float:
+    """Return the fastest of runs calls to decode, in seconds."""
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        decode()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def benchmark_json(payloads: List[Tuple[str, bytes]], runs: int = 200) -> None:
+    """Print the best decode time of each backend for each payload."""
+    decoders = {
+        "json.loads(text)": lambda body: json.loads(body.decode("utf-8")),
+        "json.loads(bytes)": json.loads,
+    }
+    if award_search.orjson is not None:
+        decoders["orjson.loads(bytes)"] = award_search.orjson.loads
+    else:
+        print("orjson is not installed; timing the stdlib decoder only.")
+    for label, body in payloads:
+        timings = ", ".join(f"{name} {best_time(lambda: decode(body), runs) * 1000:7.2f} ms"
+                            for name, decode in decoders.items())
+        print(f"{label} ({len(body) / 1024:.0f} KB): {timings}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        recorded = []
+        for path in sys.argv[1:]:
+            with open(path, "rb") as f:
+                recorded.append((os.path.basename(path), f.read()))
+        benchmark_json(recorded)
+    else:
+        benchmark_json(mock_payloads())
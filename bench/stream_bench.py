@@ -0,0 +1,86 @@
+"""Compare peak memory of a streamed and a buffered search against the local mock server.
+
+Each search runs in its own process, since peak RSS only ever grows, and
+reports how far it rose while searching a single large page. The mock
+server runs in another process: a child inherits its parent's peak RSS,
+so the parent must not hold the records itself.
+
+Usage: python bench/stream_bench.py [RECORDS ...]
+"""
+import importlib.util
+import os
+import resource
+import socket
+import subprocess
+import sys
+from typing import Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def peak_rss_mb() -> float:
+    """Return this process's peak resident set size in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_search(url: str, records: int) -> None:
+    """Search the mock server once and print the peak RSS before and after, and the match count."""
+    import award_search
+
+    client = award_search.SeatsAeroClient(api_key="bench")
+    client.base_url = url
+    # A one-page search first, so lazily imported modules are not counted against the real one
+    award_search.search_parameter_set({"take": 1, "mileage_threshold": 120000}, client)
+    before = peak_rss_mb()
+    flights, error = award_search.search_parameter_set({"take": records, "mileage_threshold": 120000}, client)
+    after = peak_rss_mb()
+    client.close()
+    if error:
+        raise SystemExit(error)
+    print(before, after, len(flights))
+
+def measure(url: str, records: int, stream: bool) -> Tuple[float, float, int]:
+    """Run one search in a fresh process, returning its peak RSS before and after, and its match count."""
+    env = dict(os.environ, STREAM_JSON="1" if stream else "0", AVAILABILITY_HISTORY="0")
+    for setting in ("RESPONSE_CACHE_PATH", "ARCHIVE_PATH", "SEARCH_DEADLINE"):
+        env.pop(setting, None)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", url, str(records)],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    before, after, matches = output.split()[-3:]
+    return float(before), float(after), int(matches)
+
+def start_mock_server(records: int) -> Tuple[subprocess.Popen, str]:
+    """Start tests/mock_server.py serving records on a free port, returning the process and its URL."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen([sys.executable, "-u", os.path.join(ROOT, "tests", "mock_server.py"),
+                               str(port), str(records)], stdout=subprocess.PIPE, text=True)
+    # The server is listening once it has announced itself
+    server.stdout.readline()
+    return server, f"http://127.0.0.1:{port}"
+
+def benchmark_stream(sizes: Tuple[int, ...] = (2_000, 20_000, 50_000)) -> None:
+    """Print the growth in peak RSS of streamed and buffered searches for single pages of each size."""
+    if importlib.util.find_spec("ijson") is None:
+        print("ijson is not installed; searches can only be buffered.")
+        return
+    for size in sizes:
+        server, url = start_mock_server(size)
+        try:
+            results = {mode: measure(url, size, mode == "streaming") for mode in ("streaming", "buffered")}
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{size:>7} records: " + ", ".join(
+            f"{mode} +{after - before:6.1f} MB ({matches} matches)"
+            for mode, (before, after, matches) in results.items()))
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        run_search(sys.argv[2], int(sys.argv[3]))
+    elif len(sys.argv) > 1:
+        benchmark_stream(tuple(int(size) for size in sys.argv[1:]))
+    else:
+        benchmark_stream()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# Keep the tests from writing history, cache or archive files into the working directory
+os.environ["AVAILABILITY_HISTORY"] = "0"
+for setting in ("RESPONSE_CACHE_PATH", "ARCHIVE_PATH", "SEARCH_DEADLINE"):
+    os.environ.pop(setting, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockSeatsAero  # noqa: E402
+
+@pytest.fixture
+def server():
+    with MockSeatsAero() as mock:
+        yield mock
@@ -0,0 +1,148 @@
+"""A local stand-in for the Seats.aero partner search API.
+
+Serves GET /search with skip/take pagination, hasMore and cursor, and ETag
+validators that answer a matching If-None-Match with 304 Not Modified.
+Setting status makes every search fail with that HTTP status instead.
+Every request is logged so tests can check what the client sent. Run it
+directly to search against it by hand:
+
+    python tests/mock_server.py [PORT] [RECORDS]
+    SEATS_AERO_BASE_URL=http://127.0.0.1:PORT python award_search.py
+"""
+import json
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+AIRPORTS = ["YVR", "YYZ", "SIN", "NRT", "LHR", "FRA"]
+SOURCES = ["aeroplan", "aeroplan", "united"]
+AIRLINES = ["AC", "AI", "NH, UA", "LH", "SQ, AI"]
+
+def make_records(count: int) -> List[Dict]:
+    """Return count deterministic availability records shaped like the API's."""
+    records = []
+    for i in range(count):
+        origin = AIRPORTS[i % len(AIRPORTS)]
+        destination = AIRPORTS[(i // len(AIRPORTS) + 1 + i) % len(AIRPORTS)]
+        record = {
+            "ID": f"rec{i}",
+            "RouteID": f"{origin}{destination}",
+            "Route": {"OriginAirport": origin, "DestinationAirport": destination, "Source": ""},
+            "Date": f"2025-03-{1 + i % 28:02d}",
+            "Source": SOURCES[i % len(SOURCES)],
+        }
+        for offset, cabin in enumerate("YWJF"):
+            available = (i + offset) % 3 != 0
+            record[f"{cabin}Available"] = available
+            record[f"{cabin}MileageCost"] = str(40000 + (i * 7919 + offset * 104729) % 160000) if available else "0"
+            record[f"{cabin}Airlines"] = AIRLINES[(i + offset) % len(AIRLINES)] if available else ""
+            record[f"{cabin}Direct"] = (i + offset) % 2 == 0
+            record[f"{cabin}RemainingSeats"] = (i + offset) % 9 if available else 0
+        records.append(record)
+    return records
+
+class MockSeatsAero:
+    """Serves records from a background thread on a free local port."""
+
+    def __init__(self, records: Optional[List[Dict]] = None, port: int = 0):
+        self.records = make_records(120) if records is None else records
+        # (path, query parameters, request headers) of every request, in arrival order
+        self.requests: List[Tuple[str, Dict[str, str], Dict[str, str]]] = []
+        self.not_modified = 0
+        # Answer every search with this status and an empty body, unless it is 200
+        self.status = 200
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to give a client in place of the real partner API."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def page(self, query: Dict[str, str]) -> Dict:
+        """Return the response body for a search query."""
+        skip = int(query.get("skip", 0))
+        take = int(query.get("take", 500))
+        data = self.records[skip:skip + take]
+        has_more = skip + take < len(self.records)
+        return {"data": data, "count": len(data), "hasMore": has_more,
+                "cursor": 1700000000 if has_more else None}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                parsed = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                with mock._lock:
+                    mock.requests.append((parsed.path, query, dict(self.headers)))
+                if parsed.path.rstrip("/").split("/")[-1] != "search":
+                    self._send(404, b"")
+                    return
+                if mock.status != 200:
+                    self._send(mock.status, b"")
+                    return
+
+                body = json.dumps(mock.page(query)).encode()
+                etag = f'"{zlib.crc32(body):08x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    with mock._lock:
+                        mock.not_modified += 1
+                    self._send(304, b"", etag)
+                    return
+                self._send(200, body, etag)
+
+            def _send(self, status: int, body: bytes, etag: Optional[str] = None) -> None:
+                self.send_response(status)
+                if status == 200:
+                    self.send_header("Content-Type", "application/json")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def search_requests(self) -> List[Dict[str, str]]:
+        """Return the query parameters of every search request so far."""
+        with self._lock:
+            return [query for path, query, _ in self.requests if path.endswith("/search")]
+
+    def start(self) -> "MockSeatsAero":
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-seats-aero", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockSeatsAero":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1200
+    server = MockSeatsAero(make_records(count), port)
+    print(f"Serving {count} records at {server.url}/search")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,28 @@
+import award_search
+
+def flight(source, cost, **fields):
+    return {"RouteID": "YVRNRT", "Origin": "YVR", "Destination": "NRT", "Date": "2025-03-01", "Cabin": "J",
+            "Airlines": "AC", "Source": source, "MileageCost": cost, "RemainingSeats": 2, **fields}
+
+def test_alert_store_compares_costs_within_one_program(tmp_path):
+    store = award_search.AlertStore(str(tmp_path / "alerts.db"))
+    store.record([flight("aeroplan", 70000)])
+
+    fresh = store.unalerted([flight("united", 80000), flight("aeroplan", 75000), flight("aeroplan", 60000)])
+    store.close()
+
+    assert [(f["Source"], f["MileageCost"]) for f in fresh] == [("united", 80000), ("aeroplan", 60000)]
+
+def test_digest_keeps_the_same_flight_once_per_program():
+    flights = [flight("aeroplan", 70000), flight("united", 60000), flight("aeroplan", 65000)]
+
+    kept = award_search.dedupe_flights(flights)
+
+    assert sorted((f["Source"], f["MileageCost"]) for f in kept) == [("aeroplan", 65000), ("united", 60000)]
+
+def test_snapshots_track_each_program_separately():
+    previous = {award_search.snapshot_key(f): f for f in [flight("aeroplan", 70000)]}
+
+    changes = award_search.diff_snapshots(previous, [flight("aeroplan", 70000), flight("united", 60000)])
+
+    assert [(change.kind, change.flight["Source"]) for change in changes] == [("added", "united")]
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+import award_search
+
+QUERY = {"take": "25"}
+
+def breaker_client(server, failure_threshold=3):
+    # No retry engine, so each call is exactly one request and one verdict for the breaker
+    breaker = award_search.CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=60)
+    client = award_search.SeatsAeroClient(api_key="test", breaker=breaker)
+    client.base_url = server.url
+    return client, breaker
+
+def open_breaker(server, client, breaker):
+    server.status = 503
+    for _ in range(breaker.failure_threshold):
+        assert client.get("search", QUERY).status_code == 503
+    assert breaker.state == breaker.OPEN
+
+def expire_reset_timeout(breaker):
+    breaker.opened_at -= breaker.reset_timeout
+
+def test_breaker_opens_after_the_threshold_and_fails_fast(server):
+    client, breaker = breaker_client(server)
+    server.status = 503
+    for _ in range(breaker.failure_threshold - 1):
+        client.get("search", QUERY)
+    assert breaker.state == breaker.CLOSED
+
+    client.get("search", QUERY)
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(award_search.CircuitOpenError):
+        client.get("search", QUERY)
+    client.close()
+
+    assert len(server.search_requests()) == breaker.failure_threshold
+    assert breaker.stats() == {"state": breaker.OPEN, "consecutive_failures": 3, "fast_failures": 1}
+
+def test_success_resets_the_consecutive_failure_count(server):
+    client, breaker = breaker_client(server)
+    server.status = 503
+    client.get("search", QUERY)
+    client.get("search", QUERY)
+    server.status = 200
+    client.get("search", QUERY)
+    server.status = 503
+    client.get("search", QUERY)
+    client.get("search", QUERY)
+    client.close()
+
+    assert breaker.state == breaker.CLOSED
+    assert breaker.consecutive_failures == 2
+
+def test_half_open_breaker_lets_a_single_probe_through(server):
+    client, breaker = breaker_client(server)
+    open_breaker(server, client, breaker)
+    expire_reset_timeout(breaker)
+    assert breaker.state == breaker.HALF_OPEN
+
+    # Another caller holds the probe slot, so this call fails fast without a request
+    breaker.before_call()
+    with pytest.raises(award_search.CircuitOpenError):
+        client.get("search", QUERY)
+    assert len(server.search_requests()) == breaker.failure_threshold
+
+    breaker.release_probe()
+    server.status = 200
+    assert client.get("search", QUERY).status_code == 200
+    client.close()
+
+    assert breaker.state == breaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+def test_failed_probe_reopens_the_breaker(server):
+    client, breaker = breaker_client(server)
+    open_breaker(server, client, breaker)
+    expire_reset_timeout(breaker)
+    reopened_after = time.monotonic()
+
+    assert client.get("search", QUERY).status_code == 503
+    assert breaker.state == breaker.OPEN
+    assert breaker.opened_at >= reopened_after
+    with pytest.raises(award_search.CircuitOpenError):
+        client.get("search", QUERY)
+    client.close()
+
+    assert len(server.search_requests()) == breaker.failure_threshold + 1
+
+def test_probe_ended_by_the_deadline_is_released(server):
+    client, breaker = breaker_client(server)
+    open_breaker(server, client, breaker)
+    expire_reset_timeout(breaker)
+
+    token = award_search._search_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(award_search.SearchDeadlineError):
+            client.get("search", QUERY)
+    finally:
+        award_search._search_deadline.reset(token)
+    assert breaker.state == breaker.HALF_OPEN
+
+    server.status = 200
+    assert client.get("search", QUERY).status_code == 200
+    client.close()
+
+    assert breaker.state == breaker.CLOSED
+    assert len(server.search_requests()) == breaker.failure_threshold + 1
@@ -0,0 +1,95 @@
+import pytest
+
+import award_search
+from mock_server import make_records
+
+# The filter fields the original business class filter returned
+BASELINE_KEYS = ("RouteID", "Origin", "Destination", "Date", "MileageCost", "Airlines", "DirectFlight",
+                 "RemainingSeats")
+
+RULE_SPECS = [
+    {},
+    {"cabins": ["Y", "J"], "sources": [], "exclude_airlines": []},
+    {"cabins": "W,F", "max_cost": {"F": 90000}, "direct_only": True},
+    {"cabins": ["J"], "require_airlines": ["UA", "SQ"], "min_seats": 3, "exclude_airlines": []},
+]
+
+def baseline_filter(flights, threshold):
+    """The filter as it was before rules: aeroplan business class under the threshold, not operated by Air India."""
+    filtered = []
+    for flight in flights:
+        if flight.get("JAvailable") and flight.get("JMileageCost") and flight.get("Source") == "aeroplan":
+            mileage_cost = int(flight["JMileageCost"])
+            airlines = flight.get("JAirlines", [])
+            if "AI" not in airlines and mileage_cost <= threshold:
+                filtered.append({
+                    "RouteID": flight.get("RouteID"),
+                    "Origin": flight["Route"].get("OriginAirport"),
+                    "Destination": flight["Route"].get("DestinationAirport"),
+                    "Date": flight.get("Date"),
+                    "MileageCost": mileage_cost,
+                    "Airlines": airlines,
+                    "DirectFlight": flight.get("JDirect"),
+                    "RemainingSeats": flight.get("JRemainingSeats"),
+                })
+    return filtered
+
+@pytest.mark.parametrize("rules", [120000, award_search.parse_filter_rules(120000)])
+def test_default_rule_matches_the_baseline_filter(rules):
+    records = make_records(600)
+
+    flights = award_search.filter_flights(records, rules, engine="scalar")
+
+    assert flights
+    assert [{key: flight[key] for key in BASELINE_KEYS} for flight in flights] == baseline_filter(records, 120000)
+    assert all(flight["Rules"] == ("J aeroplan",) for flight in flights)
+
+def test_malformed_mileage_cost_is_reported_and_skipped(capsys):
+    records = make_records(6)
+    records[0]["JMileageCost"] = "lots"
+
+    flights = award_search.filter_flights(records, 200000, engine="scalar")
+
+    assert "flight ID: rec0" in capsys.readouterr().out
+    assert [{key: flight[key] for key in BASELINE_KEYS} for flight in flights] == baseline_filter(records[1:], 200000)
+
+@pytest.mark.parametrize("spec", [
+    {"cabin": ["J"]},
+    {"cabins": ["J", "Q"]},
+    {"cabins": []},
+    {"sources": 5},
+    {"cabins": ["J"], "max_cost": {"F": 90000}},
+    {"max_cost": 90000},
+    {"max_cost": {"J": "cheap"}},
+    {"min_seats": "two"},
+])
+def test_parse_filter_rule_rejects_bad_settings(spec):
+    with pytest.raises(ValueError):
+        award_search.parse_filter_rule(120000, spec)
+
+def test_parse_filter_rules_rejects_an_empty_list():
+    with pytest.raises(ValueError):
+        award_search.parse_filter_rules(120000, [])
+
+def test_flight_matching_several_rules_is_kept_once_with_every_rule():
+    rules = award_search.parse_filter_rules(150000, [{"name": "cheap", "mileage_threshold": 80000}, {"name": "any"}])
+    records = make_records(600)
+
+    flights = award_search.filter_flights(records, rules, engine="scalar")
+
+    assert [flight["Rules"] for flight in flights if flight["MileageCost"] <= 80000]
+    for flight in flights:
+        assert flight["Rules"] == (("cheap", "any") if flight["MileageCost"] <= 80000 else ("any",))
+    assert len(flights) == len(award_search.filter_flights(records, rules[1:], engine="scalar"))
+
+@pytest.mark.parametrize("specs", [[spec] for spec in RULE_SPECS] + [RULE_SPECS])
+def test_scalar_and_numpy_engines_agree(specs):
+    pytest.importorskip("numpy")
+    records = make_records(600)
+    rules = award_search.parse_filter_rules(150000, specs)
+
+    scalar = award_search.filter_flights(records, rules, engine="scalar")
+    vector = award_search.FlightColumns(records).select(rules)
+
+    assert scalar
+    assert vector == scalar
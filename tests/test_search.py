@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+import award_search
+from mock_server import MockSeatsAero, make_records
+
+PARAMETER_SET = {"origin_airport": "YVR", "destination_airport": "NRT", "take": 25, "mileage_threshold": 150000}
+
+def sync_client(server, **kwargs) -> award_search.SeatsAeroClient:
+    client = award_search.SeatsAeroClient(api_key="test", **kwargs)
+    client.base_url = server.url
+    return client
+
+def async_client(server, **kwargs) -> award_search.AsyncSeatsAeroClient:
+    client = award_search.AsyncSeatsAeroClient(api_key="test", **kwargs)
+    client.base_url = server.url
+    return client
+
+def run_sync(server, parameter_set=PARAMETER_SET):
+    client = sync_client(server)
+    try:
+        return award_search.search_plan(award_search.single_plans([parameter_set])[0], client)
+    finally:
+        client.close()
+
+def run_async(server, parameter_set=PARAMETER_SET):
+    async def search():
+        async with async_client(server) as client:
+            return await award_search.async_search_plan(award_search.single_plans([parameter_set])[0], client)
+    return asyncio.run(search())
+
+@pytest.mark.parametrize("stream_json", [True, False])
+def test_sync_and_async_searches_return_the_same_results(server, monkeypatch, stream_json):
+    monkeypatch.setattr(award_search, "STREAM_JSON", stream_json)
+    sync_results = run_sync(server)
+    async_results = run_async(server)
+
+    flights, error = sync_results[0]
+    assert error is None
+    assert flights
+    assert async_results == sync_results
+    # Every flight the default rule kept is aeroplan business under the threshold, not operated by Air India
+    for flight in flights:
+        assert flight["Cabin"] == "J" and flight["Source"] == "aeroplan"
+        assert flight["MileageCost"] <= 150000
+        assert "AI" not in award_search.airline_codes(flight["Airlines"])
+
+@pytest.mark.parametrize("stream_json", [True, False])
+def test_search_follows_pages_until_has_more_is_false(server, monkeypatch, stream_json):
+    monkeypatch.setattr(award_search, "STREAM_JSON", stream_json)
+    client = sync_client(server)
+    records = [record for batch in award_search.iter_flight_batches({"take": 25}, client) for record in batch]
+    client.close()
+
+    assert [record["ID"] for record in records] == [record["ID"] for record in server.records]
+    queries = server.search_requests()
+    assert [int(query.get("skip", 0)) for query in queries] == [0, 25, 50, 75, 100]
+    # The cursor from each page is sent with the next page's request
+    assert "cursor" not in queries[0]
+    assert all(query["cursor"] == "1700000000" for query in queries[1:])
+
+def test_async_search_follows_pages_until_has_more_is_false(server):
+    async def fetch_all():
+        async with async_client(server) as client:
+            return [record async for page in award_search.async_iter_flight_pages({"take": 25}, client)
+                    for record in page]
+
+    records = asyncio.run(fetch_all())
+
+    assert [record["ID"] for record in records] == [record["ID"] for record in server.records]
+    assert [int(query.get("skip", 0)) for query in server.search_requests()] == [0, 25, 50, 75, 100]
+
+def test_search_stops_at_max_pages(server):
+    client = sync_client(server)
+    pages = list(award_search.iter_flight_pages({"take": 25}, client, max_pages=2))
+    client.close()
+
+    assert [len(page) for page in pages] == [25, 25]
+    assert len(server.search_requests()) == 2
+
+def expire_after_first_request(server, monkeypatch):
+    def search_time_left():
+        if server.search_requests():
+            raise award_search.SearchDeadlineError("deadline reached")
+        return None
+    monkeypatch.setattr(award_search, "search_time_left", search_time_left)
+
+def test_page_downloaded_before_the_deadline_is_still_returned(server, monkeypatch):
+    expire_after_first_request(server, monkeypatch)
+    client = sync_client(server)
+    pages = []
+    with pytest.raises(award_search.SearchDeadlineError):
+        for page in award_search.iter_flight_pages({"take": 25}, client):
+            pages.append(page)
+    client.close()
+
+    assert [len(page) for page in pages] == [25]
+    assert len(server.search_requests()) == 1
+
+def test_async_page_downloaded_before_the_deadline_is_still_returned(server, monkeypatch):
+    expire_after_first_request(server, monkeypatch)
+
+    async def fetch_pages():
+        pages = []
+        async with async_client(server) as client:
+            with pytest.raises(award_search.SearchDeadlineError):
+                async for page in award_search.async_iter_flight_pages({"take": 25}, client):
+                    pages.append(page)
+        return pages
+
+    assert [len(page) for page in asyncio.run(fetch_pages())] == [25]
+    assert len(server.search_requests()) == 1
+
+@pytest.mark.parametrize("stream_json", [True, False])
+def test_unchanged_page_is_served_from_the_stored_body_on_304(server, monkeypatch, stream_json):
+    monkeypatch.setattr(award_search, "STREAM_JSON", stream_json)
+    client = sync_client(server)
+    first = [record for batch in award_search.iter_flight_batches({"take": 200}, client) for record in batch]
+    second = [record for batch in award_search.iter_flight_batches({"take": 200}, client) for record in batch]
+    client.close()
+
+    assert second == first == server.records
+    repeat_headers = server.requests[1][2]
+    assert repeat_headers["If-None-Match"] == client.validators.request_headers({"take": 200})["If-None-Match"]
+    assert server.not_modified == 1
+
+def test_async_unchanged_page_is_served_from_the_stored_body_on_304(server):
+    async def fetch_twice():
+        async with async_client(server) as client:
+            first = await client.get_body("search", {"take": "200"})
+            second = await client.get_body("search", {"take": "200"})
+            return first, second
+
+    first, second = asyncio.run(fetch_twice())
+
+    assert second == first
+    assert award_search.parse_json(second)["data"] == server.records
+    assert server.not_modified == 1
+
+def test_single_page_response_is_cached(server):
+    client = sync_client(server, cache=award_search.ResponseCache(ttl=300, path=None))
+    first = list(award_search.iter_flight_records({"take": 200}, client))
+    second = list(award_search.iter_flight_records({"take": 200}, client))
+    client.close()
+
+    assert second == first == server.records
+    assert len(server.requests) == 1
+    assert client.cache.stats()["hits"] == 1
+
+def test_changed_page_is_downloaded_again():
+    with MockSeatsAero(make_records(10)) as server:
+        client = sync_client(server)
+        first = list(award_search.iter_flight_records({"take": 50}, client))
+        server.records = make_records(12)
+        second = list(award_search.iter_flight_records({"take": 50}, client))
+        client.close()
+
+    assert len(first) == 10
+    assert second == server.records
+    assert server.not_modified == 0
+
+def test_validator_store_ignores_the_cursor_and_stays_bounded():
+    store = award_search.ValidatorStore(max_entries=3)
+    for cursor in range(1000):
+        store.update({"take": 25, "skip": 25, "cursor": cursor}, {"ETag": f'"{cursor}"'}, b"{}")
+    assert len(store) == 1
+    assert store.request_headers({"take": 25, "skip": 25, "cursor": 5})["If-None-Match"] == '"999"'
+
+    for skip in range(10):
+        store.update({"take": 25, "skip": skip}, {"ETag": '"x"'}, b"{}")
+    assert len(store) == 3
+    assert store.body({"take": 25, "skip": 9}) == b"{}"
+    assert store.body({"take": 25, "skip": 0}) is None